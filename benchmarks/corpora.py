@@ -0,0 +1,77 @@
+"""Synthetic and replicated-fixture corpora for the parser benchmarks"""
+from pathlib import Path
+from copy import deepcopy
+from lxml import etree
+from ncbiutils.xml import _from_raw
+import gzip
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'tests' / 'data'
+
+
+def _replicate(fixture: str, tag: str, n: int) -> bytes:
+    """A document of n elements with tag, copied in turn from those of the fixture"""
+    xml_tree = _from_raw((DATA_DIR / fixture).read_bytes())
+    root = xml_tree.getroot()
+    articles = root.findall(tag)
+    for article in articles:
+        root.remove(article)
+    for i in range(n):
+        root.append(deepcopy(articles[i % len(articles)]))
+    return etree.tostring(xml_tree, xml_declaration=True, encoding='UTF-8')
+
+
+def pubmed_articles(n: int) -> bytes:
+    """PubmedArticleSet of n real-world articles"""
+    return _replicate('pubmed.xml', 'PubmedArticle', n)
+
+
+def pubmed_articles_gz(n: int) -> bytes:
+    """Gzipped PubmedArticleSet of n real-world articles, as in the FTP baseline files"""
+    return gzip.compress(pubmed_articles(n))
+
+
+def pmc_articles(n: int) -> bytes:
+    """pmc-articleset of n real-world articles"""
+    return _replicate('pmc.xml', 'article', n)
+
+
+def pubmed_author_heavy(n: int, authors: int = 1000) -> bytes:
+    """PubmedArticleSet of n articles, each with a consortium-sized AuthorList"""
+    xml_tree = _from_raw(pubmed_articles(n))
+    for author_list in xml_tree.getroot().iterfind('PubmedArticle/MedlineCitation/Article/AuthorList'):
+        template = author_list.find('Author')
+        for author in author_list.findall('Author'):
+            author_list.remove(author)
+        for i in range(authors):
+            author = deepcopy(template)
+            affiliation_info = etree.SubElement(author, 'AffiliationInfo')
+            affiliation = etree.SubElement(affiliation_info, 'Affiliation')
+            affiliation.text = f'Department {i % 50}, University {i % 7}. author{i}@example.org.'
+            author_list.append(author)
+    return etree.tostring(xml_tree, xml_declaration=True, encoding='UTF-8')
+
+
+def pmc_author_heavy(n: int, contribs: int = 1000, affs: int = 200) -> bytes:
+    """pmc-articleset of n articles, each with contribs authors cross-referencing shared affs and corresp notes"""
+    xml_tree = _from_raw(pmc_articles(n))
+    for article_meta in xml_tree.getroot().iterfind('article/front/article-meta'):
+        for contrib_group in article_meta.findall('contrib-group'):
+            article_meta.remove(contrib_group)
+        contrib_group = etree.SubElement(article_meta, 'contrib-group')
+        for i in range(contribs):
+            contrib = etree.SubElement(contrib_group, 'contrib', {'contrib-type': 'author'})
+            name = etree.SubElement(contrib, 'name')
+            etree.SubElement(name, 'surname').text = f'Surname{i}'
+            etree.SubElement(name, 'given-names').text = f'Given{i}'
+            etree.SubElement(contrib, 'xref', {'ref-type': 'aff', 'rid': f'aff{i % affs}'})
+            etree.SubElement(contrib, 'xref', {'ref-type': 'aff', 'rid': f'aff{(i + 1) % affs}'})
+            etree.SubElement(contrib, 'xref', {'ref-type': 'corresp', 'rid': f'cor{i % 10}'})
+        for i in range(affs):
+            aff = etree.SubElement(contrib_group, 'aff', {'id': f'aff{i}'})
+            aff.text = f'Department {i}, University {i % 7}, City, Country'
+        author_notes = etree.SubElement(article_meta, 'author-notes')
+        for i in range(10):
+            corresp = etree.SubElement(author_notes, 'corresp', {'id': f'cor{i}'})
+            corresp.text = 'Corresponding author. '
+            etree.SubElement(corresp, 'email').text = f'corresp{i}@example.org'
+    return etree.tostring(xml_tree, xml_declaration=True, encoding='UTF-8')
@@ -0,0 +1,51 @@
+"""Per-article cost of element lookups, parser construction and regex compilation
+
+Run from the repository root:
+
+    python -m benchmarks.lookups
+    python -m benchmarks.lookups --articles 200 --number 20
+
+Reports microseconds per call, to check that the lookups the parsers make per article
+stay cheap: article-level PMC paths anchored at front against descendant (.//) scans that
+walk the full text, a parser built per response against the shared instance, and a regex
+compiled per call against the module-level pattern.
+"""
+from typing import Callable, Dict
+import argparse
+import re
+import timeit
+from benchmarks import corpora
+from ncbiutils.ncbiutils import _get_parser
+from ncbiutils.pmcxmlparser import PmcXmlParser
+from ncbiutils.pubmedxmlparser import email_regex
+from ncbiutils.xml import _from_raw
+
+EMAIL = 'Correspondence to jane.doe@example.org, Department of Biology'
+
+
+def cases(articles: int) -> Dict[str, Callable[[], object]]:
+    pmc_articles = _from_raw(corpora.pmc_articles(articles)).getroot().findall('article')
+    return {
+        'pmc_descendant_lookups': lambda: [article.findall('.//article-meta/abstract') for article in pmc_articles],
+        'pmc_anchored_lookups': lambda: [article.findall('front/article-meta/abstract') for article in pmc_articles],
+        'parser_per_response': lambda: PmcXmlParser(compact=True, fields=frozenset({'pmid'})),
+        'parser_shared': lambda: _get_parser(PmcXmlParser, True, frozenset({'pmid'})),
+        'regex_per_call': lambda: re.compile(email_regex.pattern).search(EMAIL),
+        'regex_precompiled': lambda: email_regex.search(EMAIL),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--articles', type=int, default=100, help='PMC articles searched per lookup call')
+    parser.add_argument('--number', type=int, default=50, help='calls per timing')
+    args = parser.parse_args()
+    for name, case in cases(args.articles).items():
+        per_call = min(timeit.repeat(case, number=args.number, repeat=5)) / args.number
+        per = per_call / args.articles if name.startswith('pmc_') else per_call
+        unit = 'article' if name.startswith('pmc_') else 'call'
+        print(f'{name:<24} {per * 1e6:>10.2f} us/{unit}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""Parser throughput benchmarks
+
+Run from the repository root:
+
+    python -m benchmarks.parsers                # compare with benchmarks/baseline.json, at its scale
+    python -m benchmarks.parsers --save         # record a new baseline
+    python -m benchmarks.parsers --scale 0.5    # other corpus sizes; fails unless saved as the baseline
+
+Each case runs in a fresh process and reports articles/sec (best of --repeat runs),
+peak RSS growth over the process before the run, and the peak Python heap allocated during
+a run (tracemalloc), which stays flat for cases that stream articles. The run fails when a
+case is slower, or uses more memory, than its baseline by more than --tolerance, or when
+the baseline was recorded at another --scale. Baselines are machine-specific: record one on
+the machine that checks for regressions.
+"""
+from typing import Callable, Dict, Any, List, Tuple
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+import tracemalloc
+from benchmarks import corpora
+from ncbiutils.ncbiutils import PubMedFetch, PubMedDownload
+from ncbiutils.pmcxmlparser import PmcXmlParser
+from ncbiutils.pubmedxmlparser import PubmedXmlParser
+from ncbiutils.xml import _from_raw
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+
+Case = Callable[[float], Callable[[], int]]
+
+
+def _scaled(n: int, scale: float) -> int:
+    return max(1, int(n * scale))
+
+
+def _parse_tree(parser: Any, data: bytes) -> Callable[[], int]:
+    xml_tree = _from_raw(data)
+    return lambda: sum(1 for _ in parser.parse(xml_tree))
+
+
+def pubmed_1k(scale: float) -> Callable[[], int]:
+    return _parse_tree(PubmedXmlParser(), corpora.pubmed_articles(_scaled(1000, scale)))
+
+
+def pubmed_30k(scale: float) -> Callable[[], int]:
+    return _parse_tree(PubmedXmlParser(), corpora.pubmed_articles(_scaled(30000, scale)))
+
+
+def pubmed_parallel_30k(scale: float) -> Callable[[], int]:
+    data = corpora.pubmed_articles(_scaled(30000, scale))
+    parser = PubmedXmlParser()
+    return lambda: sum(1 for _ in parser.parse_parallel(data))
+
+
+def pubmed_projected_1k(scale: float) -> Callable[[], int]:
+    parser = PubmedXmlParser(fields={'pmid', 'title', 'abstract'})
+    return _parse_tree(parser, corpora.pubmed_articles(_scaled(1000, scale)))
+
+
+def pubmed_author_heavy(scale: float) -> Callable[[], int]:
+    return _parse_tree(PubmedXmlParser(), corpora.pubmed_author_heavy(_scaled(20, scale)))
+
+
+def pmc_1k(scale: float) -> Callable[[], int]:
+    return _parse_tree(PmcXmlParser(), corpora.pmc_articles(_scaled(1000, scale)))
+
+
+def pmc_author_heavy(scale: float) -> Callable[[], int]:
+    return _parse_tree(PmcXmlParser(), corpora.pmc_author_heavy(_scaled(5, scale)))
+
+
+def fetch_parse_xml_1k(scale: float) -> Callable[[], int]:
+    data = corpora.pubmed_articles(_scaled(1000, scale))
+    pubmed_fetch = PubMedFetch()
+    return lambda: len(pubmed_fetch._parse_xml(data))
+
+
+def fetch_parse_xml_compact_1k(scale: float) -> Callable[[], int]:
+    data = corpora.pubmed_articles(_scaled(1000, scale))
+    pubmed_fetch = PubMedFetch(compact=True)
+    return lambda: len(pubmed_fetch._parse_xml(data))
+
+
+def download_parse_response_30k(scale: float) -> Callable[[], int]:
+    data = corpora.pubmed_articles_gz(_scaled(30000, scale))
+    pubmed_download = PubMedDownload()
+    return lambda: len(pubmed_download._parse_response(data))
+
+
+CASES: Dict[str, Case] = {
+    'pubmed_1k': pubmed_1k,
+    'pubmed_30k': pubmed_30k,
+    'pubmed_parallel_30k': pubmed_parallel_30k,
+    'pubmed_projected_1k': pubmed_projected_1k,
+    'pubmed_author_heavy': pubmed_author_heavy,
+    'pmc_1k': pmc_1k,
+    'pmc_author_heavy': pmc_author_heavy,
+    'fetch_parse_xml_1k': fetch_parse_xml_1k,
+    'fetch_parse_xml_compact_1k': fetch_parse_xml_compact_1k,
+    'download_parse_response_30k': download_parse_response_30k,
+}
+
+# Higher is better for articles_per_sec, lower for the rest
+METRICS = {'articles_per_sec': 1, 'peak_rss_mb': -1, 'peak_alloc_mb': -1}
+# Changes smaller than these are noise, whatever the relative change
+METRIC_SLACK = {'articles_per_sec': 0.0, 'peak_rss_mb': 2.0, 'peak_alloc_mb': 1.0}
+
+
+def _reset_peak_rss() -> float:
+    """Reset the peak RSS where the platform allows it (Linux), and return the current peak in MB"""
+    try:
+        Path('/proc/self/clear_refs').write_text('5')
+    except OSError:
+        pass
+    return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    try:
+        for line in Path('/proc/self/status').read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 2**10
+
+
+def run_case(args: Tuple[str, float, int]) -> Dict[str, float]:
+    """Measure one case; meant to run in a fresh process"""
+    name, scale, repeat = args
+    run = CASES[name](scale)
+    rss_before = _reset_peak_rss()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        n = run()
+        best = min(best, time.perf_counter() - start)
+    peak_rss = _peak_rss_mb() - rss_before
+    tracemalloc.start()
+    run()
+    _, peak_alloc = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'articles': n,
+        'articles_per_sec': round(n / best, 1),
+        'peak_rss_mb': round(peak_rss, 1),
+        'peak_alloc_mb': round(peak_alloc / 2**20, 2),
+    }
+
+
+def compare(
+    results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float
+) -> List[str]:
+    """Describe each metric that regressed beyond tolerance relative to baseline"""
+    regressions = []
+    for name, result in results.items():
+        for metric, sign in METRICS.items():
+            expected = baseline.get(name, {}).get(metric)
+            if not expected:
+                continue
+            change = (result[metric] - expected) / expected
+            if sign * change < -tolerance and abs(result[metric] - expected) > METRIC_SLACK[metric]:
+                regressions.append(f'{name}.{metric}: {result[metric]} vs baseline {expected} ({change:+.0%})')
+    return regressions
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('cases', nargs='*', choices=[[], *CASES], help='Cases to run (default all)')
+    parser.add_argument('--scale', type=float, help='Multiplier for corpus sizes (default that of the baseline, or 1)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed fractional regression')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help='Write results as the new baseline')
+    args = parser.parse_args(argv)
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    if args.scale is None:
+        args.scale = baseline['scale'] if baseline is not None else 1.0
+
+    names = args.cases or list(CASES)
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for name in names:
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            results[name] = executor.submit(run_case, (name, args.scale, args.repeat)).result()
+        print(name, json.dumps(results[name]), flush=True)
+
+    if args.save:
+        args.baseline.write_text(json.dumps({'scale': args.scale, 'results': results}, indent=2) + '\n')
+        return 0
+    if baseline is None:
+        return 0
+    if baseline['scale'] != args.scale:
+        print(f'Baseline was recorded at scale {baseline["scale"]}, not {args.scale}; cannot compare')
+        return 1
+    regressions = compare(results, baseline['results'], args.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
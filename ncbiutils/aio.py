@@ -0,0 +1,199 @@
+from typing import Optional, Tuple, List, Dict, Any, AsyncGenerator, Awaitable, Iterable
+from enum import Enum
+from loguru import logger
+from pydantic import validator
+from ncbiutils.types import HttpMethodEnum, DownloadPathEnum
+from ncbiutils.http import RequestsError, RetryPolicy, RateLimiter
+from ncbiutils.ncbiutils import Chunk, PubMedFetch, PubMedDownload
+import asyncio
+
+try:
+    import aiohttp
+except ImportError as e:
+    raise ImportError('ncbiutils.aio requires aiohttp, e.g. pip install ncbiutils[async]') from e
+
+
+def create_session(limit: int = 10, limit_per_host: int = 10, keepalive_timeout: float = 15) -> aiohttp.ClientSession:
+    """Create a ClientSession with pooled keep-alive connections, to share among async clients
+
+    Must be called from within a running event loop; close it when done.
+    """
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host, keepalive_timeout=keepalive_timeout)
+    return aiohttp.ClientSession(connector=connector)
+
+
+def _form(params: Dict[str, Any]) -> Dict[str, str]:
+    """Body form parameters as strings, dropping those that are unset"""
+    return {k: v.value if isinstance(v, Enum) else str(v) for k, v in params.items() if v is not None}
+
+
+async def safe_requests(
+    session: aiohttp.ClientSession,
+    url: str,
+    method: str = HttpMethodEnum.GET,
+    timeout: float = 5,
+    retry: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    **opts,
+) -> Tuple[Optional[Exception], Optional[bytes]]:
+    """Asyncio counterpart of ncbiutils.http.safe_requests, returning (error, body)"""
+    client_timeout = aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)
+    attempt = 0
+    while True:
+        attempt += 1
+        error: Optional[Exception] = None
+        content = None
+        retry_after = None
+        if rate_limiter is not None:
+            await asyncio.sleep(rate_limiter.reserve())
+        try:
+            async with session.request(method, url, timeout=client_timeout, **opts) as r:
+                if r.status >= 400:
+                    error = RequestsError(r.status)
+                    retry_after = r.headers.get('Retry-After')
+                else:
+                    content = await r.read()
+        except Exception as e:
+            logger.error(f'Error encountered in request to {url}: {e}')
+            error = e
+        if retry is None or not retry.should_retry(error, attempt):
+            return error, content
+        delay = retry.get_delay(attempt, retry_after)
+        logger.warning(f'Retrying request to {url} in {delay:.2f}s after attempt {attempt}: {error}')
+        await asyncio.sleep(delay)
+
+
+async def _gather_chunks(
+    tasks: Iterable[Awaitable[Chunk]], window: int, ordered: bool = True
+) -> AsyncGenerator[Chunk, None]:
+    """Yields the results of at most window tasks running at once, in input or completion order"""
+    pending: List[asyncio.Future] = []
+
+    async def take() -> List[Chunk]:
+        if ordered:
+            return [await pending.pop(0)]
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+        return [future.result() for future in done]
+
+    try:
+        for task in tasks:
+            pending.append(asyncio.ensure_future(task))
+            while len(pending) >= window:
+                for chunk in await take():
+                    yield chunk
+        while pending:
+            for chunk in await take():
+                yield chunk
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class AsyncPubMedFetch(PubMedFetch):
+    """
+    An asyncio counterpart of PubMedFetch
+
+    Requests share the rate limit of PubMedFetch; responses are parsed in the default executor.
+    The cache, batcher and stream attributes are not supported.
+
+    Methods
+    -------
+    fetch_async(ids: List[str], session: aiohttp.ClientSession)
+        Retrieve the XML records given the list of uids
+    get_citations(uids: List[str], session: Optional[aiohttp.ClientSession] = None)
+        Yields Chunks asynchronously, in order, running max_workers requests at once
+
+    """
+
+    @validator('cache', 'batcher', 'stream')
+    def is_unsupported(cls, v, field):
+        if v:
+            raise ValueError(f'{field.name} is not supported by AsyncPubMedFetch')
+        return v
+
+    async def fetch_async(
+        self, ids: List[str], session: aiohttp.ClientSession
+    ) -> Tuple[Optional[Exception], Optional[bytes]]:
+        """Return (error, body) for the EFETCH records of ids"""
+        params = self._params(db=self.db, id=','.join(ids), retmode=self.retmode, rettype=self.rettype)
+        return await safe_requests(
+            session,
+            self.url,
+            method=HttpMethodEnum.POST,
+            data=_form(params),
+            retry=self.retry_policy,
+            rate_limiter=self._get_rate_limiter(),
+        )
+
+    async def _get_chunk_async(self, ids: List[str], session: aiohttp.ClientSession) -> Chunk:
+        citations = None
+        error, data = await self.fetch_async(ids, session)
+        if not error and data:
+            loop = asyncio.get_running_loop()
+            try:
+                citations = await loop.run_in_executor(None, self._parse_response, data)
+            except Exception as e:
+                logger.error(f'Error encountered in parsing {ids}: {e}')
+                error = e
+        return Chunk(error, citations, ids)
+
+    async def get_citations(  # type: ignore[override]
+        self, uids: List[str], session: Optional[aiohttp.ClientSession] = None
+    ) -> AsyncGenerator[Chunk, None]:
+        """Yields Chunk error, citations (possibly empty) and PubMed uids"""
+        own_session = session is None
+        client = create_session() if session is None else session
+        try:
+            tasks = (self._get_chunk_async(ids, client) for ids in self._chunks(uids, self.retmax))
+            async for chunk in _gather_chunks(tasks, self.max_workers):
+                yield chunk
+        finally:
+            if own_session:
+                await client.close()
+
+
+class AsyncPubMedDownload(PubMedDownload):
+    """
+    An asyncio counterpart of PubMedDownload
+
+    Runs max_downloads downloads at once, parsing each file in the default executor.
+    The stream, max_parsers and max_pending attributes do not apply.
+
+    Methods
+    -------
+    get_citations(files: List[str], download_path: DownloadPathEnum = DownloadPathEnum.updatefiles,
+      session: Optional[aiohttp.ClientSession] = None)
+        Yields Chunks asynchronously, one per file, in order of files unless ordered is False
+    """
+
+    async def _get_chunk_async(self, url: str, ids: List[str], session: aiohttp.ClientSession) -> Chunk:
+        citations = None
+        error, data = await safe_requests(session, url, method=HttpMethodEnum.GET, retry=self.retry_policy)
+        if not error and data:
+            loop = asyncio.get_running_loop()
+            try:
+                citations = await loop.run_in_executor(None, self._parse_response, data)
+            except Exception as e:
+                logger.error(f'Error encountered in parsing {ids}: {e}')
+                error = e
+        return Chunk(error, citations, ids)
+
+    async def get_citations(  # type: ignore[override]
+        self,
+        files: List[str],
+        download_path: DownloadPathEnum = DownloadPathEnum.updatefiles,
+        session: Optional[aiohttp.ClientSession] = None,
+    ) -> AsyncGenerator[Chunk, None]:
+        """Yields Chunk error, citations (possibly empty) and file name"""
+        url = f'{self.base_url}{DownloadPathEnum(download_path).value}'
+        own_session = session is None
+        client = create_session() if session is None else session
+        try:
+            tasks = (self._get_chunk_async(f'{url}/{file}', [file], client) for file in files)
+            async for chunk in _gather_chunks(tasks, self.max_downloads, self.ordered):
+                yield chunk
+        finally:
+            if own_session:
+                await client.close()
@@ -0,0 +1,134 @@
+from typing import Optional, List, Dict, Any, Generator, Iterable, NamedTuple
+from ncbiutils.ncbiutils import Chunk
+from ncbiutils.pubmed import AnyCitation
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError as e:
+    raise ImportError('ncbiutils.arrow requires pyarrow, e.g. pip install ncbiutils[arrow]') from e
+
+#############################
+#   Schema
+#############################
+
+_strings = pa.list_(pa.string())
+_ui = pa.struct([('ui', pa.string()), ('value', pa.string())])
+
+author_type = pa.struct(
+    [
+        ('fore_name', pa.string()),
+        ('last_name', pa.string()),
+        ('initials', pa.string()),
+        ('collective_name', pa.string()),
+        ('orcid', pa.string()),
+        ('affiliations', _strings),
+        ('emails', _strings),
+    ]
+)
+
+journal_type = pa.struct(
+    [
+        ('title', pa.string()),
+        ('issn', _strings),
+        ('volume', pa.string()),
+        ('issue', pa.string()),
+        ('pub_year', pa.string()),
+        ('pub_month', pa.string()),
+        ('pub_day', pa.string()),
+        ('iso_abbreviation', pa.string()),
+    ]
+)
+
+correspondence_type = pa.struct([('emails', _strings), ('notes', pa.string())])
+
+mesh_heading_type = pa.struct([('descriptor_name', _ui), ('qualifier_name', pa.list_(_ui))])
+
+citation_schema = pa.schema(
+    [
+        ('pmid', pa.string()),
+        ('pmc', pa.string()),
+        ('doi', pa.string()),
+        ('title', pa.string()),
+        ('abstract', pa.string()),
+        ('author_list', pa.list_(author_type)),
+        ('journal', journal_type),
+        ('publication_type_list', _strings),
+        ('correspondence', pa.list_(correspondence_type)),
+        ('mesh_list', pa.list_(mesh_heading_type)),
+        ('version', pa.string()),
+    ]
+)
+
+
+class BatchChunk(NamedTuple):
+    """Counterpart of Chunk holding the citations as a record batch of citation_schema"""
+
+    error: Optional[Exception]
+    batch: Optional[pa.RecordBatch]
+    ids: Optional[List[str]]
+
+
+#############################
+#   Conversion
+#############################
+
+
+def _fields(value: Any) -> Dict[str, Any]:
+    """Field values of a model or record"""
+    return value._asdict() if hasattr(value, '_asdict') else dict(value)
+
+
+def _author_list(citation: AnyCitation) -> Optional[List[Dict[str, Any]]]:
+    if citation.author_list is None:
+        return None
+    return [_fields(author) for author in citation.author_list]
+
+
+def to_record_batch(citations: List[AnyCitation]) -> pa.RecordBatch:
+    """Convert Citations or CitationRecords to a record batch, building each column in one pass"""
+    columns = {
+        'pmid': [citation.pmid for citation in citations],
+        'pmc': [citation.pmc for citation in citations],
+        'doi': [citation.doi for citation in citations],
+        'title': [citation.title for citation in citations],
+        'abstract': [citation.abstract for citation in citations],
+        'author_list': [_author_list(citation) for citation in citations],
+        'journal': [_fields(citation.journal) for citation in citations],
+        'publication_type_list': [citation.publication_type_list for citation in citations],
+        'correspondence': [citation.correspondence for citation in citations],
+        'mesh_list': [citation.mesh_list for citation in citations],
+        'version': [citation.version for citation in citations],
+    }
+    arrays = [pa.array(columns[field.name], type=field.type) for field in citation_schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=citation_schema)
+
+
+def record_batches(chunks: Iterable[Chunk]) -> Generator[BatchChunk, None, None]:
+    """Yields a BatchChunk for each Chunk, e.g. from PubMedFetch get_citations or get_search_citations"""
+    for chunk in chunks:
+        batch = to_record_batch(chunk.citations) if chunk.citations is not None else None
+        yield BatchChunk(chunk.error, batch, chunk.ids)
+
+
+def write_parquet(
+    batches: Iterable[pa.RecordBatch],
+    base_dir: str,
+    max_rows_per_file: int = 1_000_000,
+    max_rows_per_group: int = 64 * 1024,
+) -> None:
+    """Stream record batches to Parquet files part-0.parquet, part-1.parquet, ... in base_dir
+
+    Batches are written as they arrive, each file holding at most max_rows_per_file rows.
+    Any files already in base_dir are deleted, so a re-written directory holds only these batches.
+    """
+    ds.write_dataset(
+        batches,
+        base_dir,
+        schema=citation_schema,
+        format='parquet',
+        basename_template='part-{i}.parquet',
+        max_rows_per_file=max_rows_per_file,
+        max_rows_per_group=min(max_rows_per_group, max_rows_per_file),
+        existing_data_behavior='delete_matching',
+    )
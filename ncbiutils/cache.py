@@ -0,0 +1,113 @@
+from typing import Optional, List, Dict, Iterable
+from threading import Lock
+from ncbiutils.pubmed import Citation
+import sqlite3
+import time
+
+
+def _placeholders(values: List[str]) -> str:
+    """SQL parameter placeholders for each of values"""
+    return ','.join('?' * len(values))
+
+
+class CitationCache:
+    """
+    A persistent SQLite store of Citations, keyed by namespace (e.g. the database) and id
+
+    Attributes
+    ----------
+    path : str
+        Location of the SQLite database file, or ':memory:'
+    ttl : Optional[float]
+        Seconds after which a stored Citation expires (default never)
+    max_entries : Optional[int]
+        Maximum number of Citations kept, least recently used are evicted first (default unbounded)
+
+    Methods
+    ----------
+    get_many(namespace: str, keys: Iterable[str]) -> Dict[str, Citation]
+        Return the unexpired Citations stored for keys
+    put_many(namespace: str, citations: Dict[str, Citation])
+        Store Citations by key, evicting entries beyond max_entries
+    evict() -> int
+        Remove expired and excess entries, returning the number removed
+    """
+
+    batch_size = 500
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS citations ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, data TEXT NOT NULL, '
+                'created REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS citations_accessed ON citations (accessed)')
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM citations').fetchone()[0]
+
+    def _batches(self, keys: List[str]) -> Iterable[List[str]]:
+        for i in range(0, len(keys), self.batch_size):
+            yield keys[i : i + self.batch_size]
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Citation]:
+        now = time.time()
+        oldest = now - self.ttl if self.ttl is not None else float('-inf')
+        found: Dict[str, Citation] = {}
+        with self._lock, self._connection:
+            for batch in self._batches(list(dict.fromkeys(keys))):
+                rows = self._connection.execute(
+                    'SELECT key, data FROM citations WHERE namespace = ? AND created >= ? '
+                    f'AND key IN ({_placeholders(batch)})',
+                    [namespace, oldest, *batch],
+                ).fetchall()
+                hits = [key for key, _ in rows]
+                if hits:
+                    self._connection.execute(
+                        f'UPDATE citations SET accessed = ? WHERE namespace = ? AND key IN ({_placeholders(hits)})',
+                        [now, namespace, *hits],
+                    )
+                for key, data in rows:
+                    found[key] = Citation.parse_raw(data)
+        return found
+
+    def put_many(self, namespace: str, citations: Dict[str, Citation]) -> None:
+        now = time.time()
+        rows = [(namespace, key, citation.json(), now, now) for key, citation in citations.items()]
+        with self._lock, self._connection:
+            self._connection.executemany('INSERT OR REPLACE INTO citations VALUES (?, ?, ?, ?, ?)', rows)
+            if self.max_entries is not None:
+                self._evict_excess()
+
+    def _evict_excess(self) -> int:
+        cursor = self._connection.execute(
+            'DELETE FROM citations WHERE rowid IN '
+            '(SELECT rowid FROM citations ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+            [self.max_entries],
+        )
+        return cursor.rowcount
+
+    def evict(self) -> int:
+        removed = 0
+        with self._lock, self._connection:
+            if self.ttl is not None:
+                cursor = self._connection.execute('DELETE FROM citations WHERE created < ?', [time.time() - self.ttl])
+                removed += cursor.rowcount
+            if self.max_entries is not None:
+                removed += self._evict_excess()
+        return removed
+
+    def clear(self) -> None:
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM citations')
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
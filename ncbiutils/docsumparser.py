@@ -0,0 +1,104 @@
+from pydantic import BaseModel
+from typing import Optional, List, Generator, Dict, Any
+from typing_extensions import TypeAlias
+from ncbiutils.pubmed import Summary
+from ncbiutils.xml import Element, XmlTree
+import json
+
+#############################
+#   Aliases
+#############################
+
+DocSum: TypeAlias = Element
+ESummaryResult: TypeAlias = Element
+
+
+def _blank_to_none(value: Optional[str]) -> Optional[str]:
+    return value if value else None
+
+
+class DocSumParser(BaseModel):
+    """
+    Capabilities to parse ESUMMARY document summaries, in XML (version 1.0) or JSON (version 2.0)
+    See DTD https://eutils.ncbi.nlm.nih.gov/eutils/dtd/20041029/esummary-v1.dtd
+
+    Summaries reported as errors, e.g. for an unknown uid, are skipped.
+
+    Methods
+    ----------
+    parse(xml_tree: XmlTree) -> Generator[Summary, None, None]
+        Return the summaries given an eSummaryResult XML document
+    parse_json(data: bytes) -> Generator[Summary, None, None]
+        Return the summaries given an ESUMMARY JSON response
+    """
+
+    def _get_items(self, docsum: DocSum) -> Dict[str, Element]:
+        return {item.get('Name'): item for item in docsum.iterchildren('Item')}
+
+    def _get_item_list(self, item: Optional[Element]) -> List[str]:
+        return [child.text for child in item.iterchildren('Item') if child.text] if item is not None else []
+
+    def _get_item_text(self, items: Dict[str, Element], name: str) -> Optional[str]:
+        item = items.get(name)
+        return _blank_to_none(item.text) if item is not None else None
+
+    def _get_summary(self, docsum: DocSum) -> Summary:
+        items = self._get_items(docsum)
+        article_ids = {item.get('Name'): item.text for item in items['ArticleIds']} if 'ArticleIds' in items else {}
+        return Summary(
+            uid=docsum.findtext('Id'),
+            title=self._get_item_text(items, 'Title'),
+            authors=self._get_item_list(items.get('AuthorList')),
+            source=self._get_item_text(items, 'Source'),
+            full_journal_name=self._get_item_text(items, 'FullJournalName'),
+            issn=self._get_item_text(items, 'ISSN') or self._get_item_text(items, 'ESSN'),
+            volume=self._get_item_text(items, 'Volume'),
+            issue=self._get_item_text(items, 'Issue'),
+            pages=self._get_item_text(items, 'Pages'),
+            pub_date=self._get_item_text(items, 'PubDate'),
+            pub_types=self._get_item_list(items.get('PubTypeList')),
+            doi=_blank_to_none(article_ids.get('doi')),
+            pmid=_blank_to_none(article_ids.get('pubmed') or article_ids.get('pmid')),
+            pmc=_blank_to_none(article_ids.get('pmc')),
+        )
+
+    def _get_json_summary(self, document: Dict[str, Any]) -> Summary:
+        article_ids = {article_id['idtype']: article_id['value'] for article_id in document.get('articleids', [])}
+        return Summary(
+            uid=document['uid'],
+            title=_blank_to_none(document.get('title')),
+            authors=[author['name'] for author in document.get('authors', []) if author.get('name')],
+            source=_blank_to_none(document.get('source')),
+            full_journal_name=_blank_to_none(document.get('fulljournalname')),
+            issn=_blank_to_none(document.get('issn')) or _blank_to_none(document.get('essn')),
+            volume=_blank_to_none(document.get('volume')),
+            issue=_blank_to_none(document.get('issue')),
+            pages=_blank_to_none(document.get('pages')),
+            pub_date=_blank_to_none(document.get('pubdate')),
+            pub_types=document.get('pubtype', []),
+            doi=_blank_to_none(article_ids.get('doi')),
+            pmid=_blank_to_none(article_ids.get('pubmed') or article_ids.get('pmid')),
+            pmc=_blank_to_none(article_ids.get('pmc')),
+        )
+
+    def _get_ESummaryResult(self, xml_tree: XmlTree) -> ESummaryResult:
+        esummary_result = xml_tree.getroot()
+        if esummary_result.tag != 'eSummaryResult':
+            raise ValueError('XML document does not contain an eSummaryResult')
+        return esummary_result
+
+    def parse(self, xml_tree: XmlTree) -> Generator[Summary, None, None]:
+        """Parse an eSummaryResult XML document to summaries"""
+        esummary_result = self._get_ESummaryResult(xml_tree)
+        for docsum in esummary_result.iterchildren('DocSum'):
+            yield self._get_summary(docsum)
+
+    def parse_json(self, data: bytes) -> Generator[Summary, None, None]:
+        """Parse an ESUMMARY JSON response to summaries"""
+        document = json.loads(data)
+        if 'result' not in document:
+            raise ValueError(document.get('error', 'JSON document does not contain a result'))
+        result = document['result']
+        for uid in result.get('uids', []):
+            if uid in result and 'error' not in result[uid]:
+                yield self._get_json_summary(result[uid])
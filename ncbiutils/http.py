@@ -1,5 +1,13 @@
 import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
 from loguru import logger
+from threading import Lock, local
+from typing import Optional, Dict, Tuple, Type, Iterable
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import random
+import time
 
 
 class RequestsError(Exception):
@@ -17,18 +25,317 @@ class RequestsError(Exception):
         super().__init__(self.message)
 
 
-def safe_requests(url, method='GET', headers={}, timeout=5, **opts):
-    """Wraps requests to handle bad HTTP status, exceptions"""
-    error = None
-    response = None
-    try:
-        r = requests.request(method, url, headers=headers, timeout=timeout, **opts)
-    except Exception as e:
-        logger.error(f'Error encountered in request to {url}: {e}')
-        error = e
-    else:
-        if not r.ok:
-            error = RequestsError(r.status_code)
-        response = r
-    finally:
-        return (error, response)
+class SessionPool:
+    """Thread-safe source of requests Sessions that share keep-alive connection pools
+
+    Each thread gets its own Session, while every Session mounts the same adapter,
+    so TCP/TLS connections are reused across requests and threads.
+
+    Attributes
+    ----------
+    pool_connections : int
+        Number of hosts to keep connection pools for
+    pool_maxsize : int
+        Maximum number of connections kept alive per host
+    pool_block : bool
+        Wait for a free connection rather than open one beyond pool_maxsize
+    """
+
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block
+        )
+        self._local = local()
+
+    @property
+    def session(self) -> requests.Session:
+        """The Session for the calling thread"""
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.mount('https://', self._adapter)
+            session.mount('http://', self._adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method, url, **opts) -> requests.Response:
+        return self.session.request(method, url, **opts)
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        self._adapter.close()
+
+
+default_session_pool = SessionPool()
+
+
+class RateLimiter:
+    """Thread-safe token bucket limiting callers to a number of acquisitions per second
+
+    Attributes
+    ----------
+    rate : float
+        Tokens added per second
+    burst : int
+        Maximum number of tokens that can accumulate while idle
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0 or burst < 1:
+            raise ValueError('Rate and burst must be positive')
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def reserve(self) -> float:
+        """Take a token without blocking and return the seconds to wait before it may be used"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return -self._tokens / self.rate if self._tokens < 0 else 0
+
+    def lower(self, rate: float) -> None:
+        """Reduce the rate to at most rate, leaving a lower rate as it is"""
+        with self._lock:
+            self.rate = min(self.rate, rate)
+
+    def acquire(self) -> None:
+        """Take a token, blocking until one is available"""
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class AdaptiveBatcher:
+    """Thread-safe batch size tuned from the latency, response size and errors of completed requests
+
+    After each successful request the size moves toward the number of records expected to take
+    target_seconds and target_bytes, growing at most by growth per request; after each failure it halves.
+
+    Attributes
+    ----------
+    size : int
+        Current number of records per request
+    minimum : int
+        Smallest size, also the smallest part a failed batch is split into
+    maximum : int
+        Largest size
+    target_seconds : float
+        Desired duration of a request, from sending it to reading the response, well within the request timeout
+    target_bytes : int
+        Desired size of a response body
+    growth : float
+        Largest factor by which the size grows after a success
+    smoothing : float
+        Weight of the latest request in the moving averages of seconds and bytes per record
+    """
+
+    def __init__(
+        self,
+        initial: int = 500,
+        minimum: int = 20,
+        maximum: int = 10000,
+        target_seconds: float = 2.0,
+        target_bytes: int = 32 * 2**20,
+        growth: float = 2.0,
+        smoothing: float = 0.5,
+    ):
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError('Sizes must satisfy 1 <= minimum <= initial <= maximum')
+        if target_seconds <= 0 or target_bytes <= 0 or growth < 1 or not 0 < smoothing <= 1:
+            raise ValueError('Targets must be positive, growth at least 1 and smoothing in (0, 1]')
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_seconds = target_seconds
+        self.target_bytes = target_bytes
+        self.growth = growth
+        self.smoothing = smoothing
+        self._size = initial
+        self._seconds: Optional[float] = None
+        self._bytes: Optional[float] = None
+        self._lock = Lock()
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return self._size
+
+    def _average(self, average: Optional[float], value: float) -> float:
+        return value if average is None else self.smoothing * value + (1 - self.smoothing) * average
+
+    def record(self, size: int, seconds: float, nbytes: int) -> None:
+        """Record a successful request for size records that took seconds and returned nbytes"""
+        if size < 1:
+            return
+        with self._lock:
+            self._seconds = self._average(self._seconds, seconds / size)
+            self._bytes = self._average(self._bytes, nbytes / size)
+            ideal = min(
+                self.target_seconds / self._seconds if self._seconds > 0 else self.maximum,
+                self.target_bytes / self._bytes if self._bytes > 0 else self.maximum,
+            )
+            self._size = int(max(self.minimum, min(self.maximum, ideal, self._size * self.growth)))
+
+    def record_error(self) -> None:
+        """Record a failed request"""
+        with self._lock:
+            self._size = max(self.minimum, self._size // 2)
+
+
+class RetryPolicy:
+    """Classifies failed requests as retryable and schedules their exponential backoff
+
+    Attributes
+    ----------
+    max_attempts : int
+        Maximum number of attempts per request, including the first
+    backoff_factor : float
+        Seconds to wait before the first retry, doubling for each subsequent retry
+    max_backoff : float
+        Upper bound on the computed backoff, in seconds
+    max_retry_after : float
+        Upper bound on a delay requested by a Retry-After header, in seconds
+    jitter : float
+        Fraction of the backoff added at random, to spread out retries
+    retry_statuses : Iterable[int]
+        HTTP status codes worth retrying
+    retry_exceptions : Tuple[Type[Exception], ...]
+        Exceptions worth retrying
+    counters : Dict[str, int]
+        Totals of attempts, retries, exhausted retries and causes (e.g. 'status:429'), across all requests
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 30,
+        max_retry_after: float = 60,
+        jitter: float = 0.5,
+        retry_statuses: Iterable[int] = (429, 500, 502, 503, 504),
+        retry_exceptions: Tuple[Type[Exception], ...] = (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+        ),
+    ):
+        if max_attempts < 1:
+            raise ValueError('Must make at least one attempt')
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = retry_exceptions
+        self._counters: Counter = Counter()
+        self._lock = Lock()
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def count(self, *keys: str) -> None:
+        with self._lock:
+            self._counters.update(keys)
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, RequestsError):
+            return error.status in self.retry_statuses
+        return isinstance(error, self.retry_exceptions)
+
+    def _parse_retry_after(self, retry_after: str) -> Optional[float]:
+        """Seconds to wait given a Retry-After header, in seconds or as a date, or None if it is neither"""
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+        try:
+            return (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """Seconds to wait after the given failed attempt, honouring any Retry-After header up to max_retry_after"""
+        seconds = self._parse_retry_after(retry_after) if retry_after else None
+        if seconds is not None:
+            return min(self.max_retry_after, max(0.0, seconds))
+        delay = min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1))
+        return delay + random.uniform(0, self.jitter * delay)
+
+    def should_retry(self, error: Optional[Exception], attempt: int) -> bool:
+        """Record the outcome of an attempt and return whether to try again"""
+        cause = None
+        if isinstance(error, RequestsError):
+            cause = f'status:{error.status}'
+        elif error is not None:
+            cause = f'exception:{type(error).__name__}'
+        self.count('attempts', *([cause] if cause else []))
+        if error is None or not self.is_retryable(error):
+            return False
+        if attempt >= self.max_attempts:
+            self.count('exhausted')
+            return False
+        self.count('retries')
+        return True
+
+
+default_retry_policy = RetryPolicy()
+
+
+def safe_requests(
+    url,
+    method='GET',
+    headers={},
+    timeout=5,
+    session: Optional[SessionPool] = None,
+    retry: Optional[RetryPolicy] = None,
+    rate_limiter: Optional[RateLimiter] = None,
+    read_body: bool = False,
+    **opts,
+):
+    """Wraps requests to handle bad HTTP status, exceptions, optionally reusing pooled connections
+
+    Given a RetryPolicy, retryable errors are attempted again after a backoff;
+    given a RateLimiter, every attempt first waits for a token.
+    With read_body, a streamed body is read within the attempt, so a failed read is retried too.
+    """
+    client = session if session is not None else requests
+    attempt = 0
+    while True:
+        attempt += 1
+        error = None
+        response = None
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            r = client.request(method, url, headers=headers, timeout=timeout, **opts)
+        except Exception as e:
+            logger.error(f'Error encountered in request to {url}: {e}')
+            error = e
+        else:
+            response = r
+            if not r.ok:
+                error = RequestsError(r.status_code)
+            elif read_body:
+                try:
+                    r.content
+                except Exception as e:
+                    logger.error(f'Error encountered in reading response from {url}: {e}')
+                    error = e
+        if retry is None or not retry.should_retry(error, attempt):
+            return (error, response)
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        delay = retry.get_delay(attempt, retry_after)
+        logger.warning(f'Retrying request to {url} in {delay:.2f}s after attempt {attempt}: {error}')
+        if response is not None:
+            response.close()
+        time.sleep(delay)
@@ -0,0 +1,81 @@
+from threading import Lock
+from typing import Optional, Dict, Callable, Mapping, Iterator, ContextManager, Any, TypeVar
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+import time
+
+T = TypeVar('T')
+
+
+class Metrics:
+    """Thread-safe totals of the time spent in, and the bytes and articles passing through, each stage of retrieval
+
+    Counters only ever increase, as Prometheus counters do, and are keyed by kind and stage, e.g.
+    'seconds:decompress', 'calls:decompress', 'bytes:download', 'articles' or 'seconds:field:author_list'.
+    A copy sent to another process, e.g. a parser process, starts empty and without a callback; its
+    counters are merged back with update.
+
+    Attributes
+    ----------
+    callback : Optional[Callable[[str, float], None]]
+        Called with each key and increment as it is recorded, e.g. to increment a Prometheus counter
+    counters : Dict[str, float]
+        Totals recorded so far
+    """
+
+    def __init__(self, callback: Optional[Callable[[str, float], None]] = None):
+        self.callback = callback
+        self._counters: Counter = Counter()
+        self._lock = Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__()  # type: ignore
+
+    @property
+    def counters(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._counters)
+
+    def update(self, counters: Mapping[str, float]) -> None:
+        """Add each of counters to its total"""
+        with self._lock:
+            self._counters.update(counters)
+        if self.callback is not None:
+            for key, value in counters.items():
+                self.callback(key, value)
+
+    def count(self, key: str, value: float = 1) -> None:
+        """Add value to the total of key"""
+        self.update({key: value})
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """Record the seconds spent in, and a call to, stage for the duration of the block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.update({f'seconds:{stage}': time.perf_counter() - start, f'calls:{stage}': 1})
+
+    def call(self, stage: str, function: Callable[..., T], *args: Any) -> T:
+        """Return function(*args), recording the seconds spent in, and a call to, stage"""
+        with self.timer(stage):
+            return function(*args)
+
+
+def _timer(metrics: Optional[Metrics], stage: str) -> ContextManager:
+    """The timer of stage, or a context doing nothing without metrics"""
+    return metrics.timer(stage) if metrics is not None else nullcontext()
+
+
+def _count(metrics: Optional[Metrics], key: str, value: float = 1) -> None:
+    if metrics is not None:
+        metrics.count(key, value)
+
+
+def _call(stage: str, function: Callable[..., T], *args: Any) -> T:
+    """Return function(*args), the untimed counterpart of Metrics.call"""
+    return function(*args)
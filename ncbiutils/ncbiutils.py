@@ -1,22 +1,189 @@
-from pydantic import BaseModel, validator
-from typing import ClassVar, Any, Optional, Tuple, List, Dict, Generator, Union, NamedTuple
-from ncbiutils.types import HttpMethodEnum, DbEnum, RetModeEnum, RetTypeEnum, DownloadPathEnum, DocTypeEnum
-from ncbiutils.http import safe_requests
+from pydantic import BaseModel, validator, root_validator
+from typing import (
+    ClassVar,
+    FrozenSet,
+    Any,
+    Optional,
+    Tuple,
+    List,
+    Dict,
+    Deque,
+    Generator,
+    Union,
+    NamedTuple,
+    Callable,
+    Iterable,
+    TypeVar,
+    Type,
+)
+from ncbiutils.types import (
+    HttpMethodEnum,
+    DbEnum,
+    RetModeEnum,
+    RetTypeEnum,
+    LinkCmdEnum,
+    IdStatusEnum,
+    DownloadPathEnum,
+    DocTypeEnum,
+)
+from ncbiutils.http import (
+    safe_requests,
+    RequestsError,
+    AdaptiveBatcher,
+    RateLimiter,
+    SessionPool,
+    default_session_pool,
+    RetryPolicy,
+    default_retry_policy,
+)
 from ncbiutils.pubmedxmlparser import PubmedXmlParser
 from ncbiutils.pmcxmlparser import PmcXmlParser
-from ncbiutils.pubmed import Citation
-from ncbiutils.xml import _from_raw
+from ncbiutils.docsumparser import DocSumParser
+from ncbiutils.pubmed import (
+    Citation,
+    CitationRecord,
+    DeletedCitation,
+    Summary,
+    AnyCitation,
+    _check_fields,
+    _project,
+)
+from ncbiutils.cache import CitationCache
+from ncbiutils.metrics import Metrics, _timer, _count
+from ncbiutils.xml import XmlTree, XmlSource, _from_raw, _iterparse_records
+from loguru import logger
+from multiprocessing.context import BaseContext
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from functools import lru_cache
+from threading import Lock
+from datetime import datetime
 import gzip
+import multiprocessing
+import re
+import sys
+import time
+
+
+T = TypeVar('T')
+Parser = TypeVar('Parser', PubmedXmlParser, PmcXmlParser)
+
+
+@lru_cache(maxsize=None)
+def _get_parser(parser_type: Type[Parser], compact: bool = False, fields: Optional[FrozenSet[str]] = None) -> Parser:
+    """The parser of parser_type with the given options, created once and shared by all clients"""
+    return parser_type(compact=compact, fields=fields)
+
+
+# DocSumParser takes no options, so one instance serves all clients
+_docsum_parser = DocSumParser()
 
 
 class Chunk(NamedTuple):
-    """Article citations are delivered in multiple Chunks"""
+    """Article citations (or summaries) are delivered in multiple Chunks"""
 
     error: Optional[Exception]
-    citations: Optional[List[Citation]]
+    citations: Optional[List[Any]]
     ids: Optional[List[str]]
 
 
+class StatusChunk(NamedTuple):
+    """A Chunk that also reports whether each id was found, missing from the response or errored"""
+
+    error: Optional[Exception]
+    citations: Optional[List[Any]]
+    ids: List[str]
+    status: Dict[str, IdStatusEnum]
+
+
+class PageChunk(NamedTuple):
+    """A Chunk that also reports the retstart of its page of a history server result set, e.g. to fetch it again"""
+
+    error: Optional[Exception]
+    citations: Optional[List[Any]]
+    ids: Optional[List[str]]
+    retstart: int
+
+
+class SearchResult(NamedTuple):
+    """The records matching an ESEARCH query, held on the history server when webenv and query_key are set"""
+
+    total: int
+    webenv: Optional[str]
+    query_key: Optional[str]
+    ids: List[str]
+
+
+class Link(NamedTuple):
+    """An ELINK edge from a source id to a target id, e.g. the pubmed_pmc link from a PMID to its PMC id
+
+    The score, the similarity of the records, is reported only by cmd neighbor_score.
+    """
+
+    source: str
+    target: str
+    linkname: str
+    score: Optional[int] = None
+
+
+class Update(NamedTuple):
+    """The citations added or revised by a download file, and the records it deletes"""
+
+    error: Optional[Exception]
+    citations: Optional[List[AnyCitation]]
+    deletions: Optional[List[DeletedCitation]]
+    ids: Optional[List[str]]
+
+
+def _to_citation(citation: AnyCitation) -> Citation:
+    return citation.to_citation() if isinstance(citation, CitationRecord) else citation
+
+
+class RemoteFile(NamedTuple):
+    """A data file listed on the PubMed download site"""
+
+    name: str
+    year: int
+    sequence: int
+    size: Optional[int]
+    modified: Optional[datetime]
+
+
+listing_regex = re.compile(
+    r'<a href="(?P<name>[^"/?]+)">[^<]*</a>\s+(?P<modified>\d{4}-\d{2}-\d{2} \d{2}:\d{2})\s+(?P<size>[\d.]+[KMGT]?|-)'
+)
+data_file_regex = re.compile(r'^pubmed(?P<year>\d{2})n(?P<sequence>\d{4})\.xml\.gz$')
+size_units = {'': 1, 'K': 2**10, 'M': 2**20, 'G': 2**30, 'T': 2**40}
+
+
+def _parse_size(size: str) -> Optional[int]:
+    """Bytes, approximately, from a listing size such as 812, 5.5M or -"""
+    if size == '-':
+        return None
+    unit = size[-1] if size[-1] in size_units else ''
+    return int(float(size[: len(size) - len(unit)]) * size_units[unit])
+
+
+def _parse_listing(html: str) -> List[RemoteFile]:
+    """The data files in an HTML directory index, in the order listed"""
+    files = []
+    for match in listing_regex.finditer(html):
+        name = match.group('name')
+        data_file = data_file_regex.match(name)
+        if data_file is None:
+            continue
+        files.append(
+            RemoteFile(
+                name=name,
+                year=2000 + int(data_file.group('year')),
+                sequence=int(data_file.group('sequence')),
+                size=_parse_size(match.group('size')),
+                modified=datetime.strptime(match.group('modified'), '%Y-%m-%d %H:%M'),
+            )
+        )
+    return files
+
+
 class Eutil(BaseModel):
     """
     A base class for other NCBI E-Utilities
@@ -27,6 +194,14 @@ class Eutil(BaseModel):
         Base URL for the various NCBI E-Utilities
     retmax_limit : int
         Maximum number of records that can be returned
+    rate_limit : float
+        Requests per second allowed by NCBI without an API key
+    rate_limit_api_key : float
+        Requests per second allowed by NCBI with an API key
+    session_pool : SessionPool
+        Pooled keep-alive connections used for requests (default shared with PubMedDownload)
+    retry_policy : RetryPolicy
+        Retries and counters for failed requests (default shared with PubMedDownload)
 
     Attributes
     ----------
@@ -36,6 +211,11 @@ class Eutil(BaseModel):
         Maximum number of records to return (default 10000)
     api_key : str
         Key for NCBI E-Utilities
+    requests_per_second : float
+        Rate shared by all requests with the same api_key, the lowest set for the key applying to all of them
+        (default rate_limit or rate_limit_api_key)
+    max_workers : int
+        Number of requests to run concurrently (default 1)
 
     Methods
     ----------
@@ -46,10 +226,18 @@ class Eutil(BaseModel):
 
     base_url: ClassVar[str] = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
     retmax_limit: ClassVar[int] = 10000
+    rate_limit: ClassVar[float] = 3
+    rate_limit_api_key: ClassVar[float] = 10
+    session_pool: ClassVar[SessionPool] = default_session_pool
+    retry_policy: ClassVar[RetryPolicy] = default_retry_policy
+    _rate_limiters: ClassVar[Dict[Optional[str], RateLimiter]] = {}
+    _rate_limiters_lock: ClassVar[Lock] = Lock()
 
     retstart: int = 0
     retmax: int = retmax_limit
     api_key: Optional[str] = None
+    requests_per_second: Optional[float] = None
+    max_workers: int = 1
 
     @validator('retmax')
     def retmax_is_nonneg_lt_limit(cls, v):
@@ -57,13 +245,74 @@ class Eutil(BaseModel):
             raise ValueError(f'Must be positive number less than {cls.retmax_limit}')
         return v
 
-    def request(self, url: str, **opts) -> Tuple[Optional[Exception], Any]:
-        """Call one of the NCBI E-Utilities and return (error, requests.Response)"""
+    @validator('requests_per_second', always=True)
+    def requests_per_second_default(cls, v, values):
+        if v is None:
+            return cls.rate_limit_api_key if values.get('api_key') else cls.rate_limit
+        if v <= 0:
+            raise ValueError('Must be a positive number')
+        return v
+
+    @validator('max_workers')
+    def max_workers_is_positive(cls, v):
+        if v < 1:
+            raise ValueError('Must be a positive number')
+        return v
+
+    def _get_rate_limiter(self) -> RateLimiter:
+        """Return the RateLimiter shared by instances with the same api_key, at the lowest rate any of them set"""
+        rate = self.requests_per_second or self.rate_limit
+        with self._rate_limiters_lock:
+            rate_limiter = self._rate_limiters.get(self.api_key)
+            if rate_limiter is None:
+                rate_limiter = self._rate_limiters[self.api_key] = RateLimiter(rate)
+        rate_limiter.lower(rate)
+        return rate_limiter
+
+    def _params(self, **opts) -> Dict[str, Any]:
+        """Body form parameters for a request with the given options"""
         params: Dict[str, Union[str, int]] = {'retstart': self.retstart, 'retmax': self.retmax}
         params.update(opts)
         if self.api_key:
             params.update({'api_key': self.api_key})
-        err, response = safe_requests(url, method=HttpMethodEnum.POST, files=params, stream=True)
+        return params
+
+    def _chunks(self, lst: List[str], n: int) -> Generator[List[str], None, None]:
+        """Yield successive n-sized chunks from lst."""
+        for i in range(0, len(lst), n):
+            yield lst[i : i + n]
+
+    def _get_chunks_concurrent(self, get_chunk: Callable[[Any], T], args: Iterable[Any]) -> Generator[T, None, None]:
+        """Yields the Chunks of get_chunk for each of args in order, run in a thread pool of max_workers"""
+        pending: Deque[Future] = deque()
+        with ThreadPoolExecutor(self.max_workers) as executor:
+            for arg in args:
+                pending.append(executor.submit(get_chunk, arg))
+                if len(pending) >= 2 * self.max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    def request(self, url: str, **opts) -> Tuple[Optional[Exception], Any]:
+        """Call one of the NCBI E-Utilities and return (error, requests.Response)
+
+        A list of values is sent as a repeated parameter, e.g. id=1&id=2.
+        """
+        params = self._params(**opts)
+        fields = [
+            (key, value)
+            for key, values in params.items()
+            for value in (values if isinstance(values, list) else [values])
+        ]
+        err, response = safe_requests(
+            url,
+            method=HttpMethodEnum.POST,
+            files=fields,
+            stream=True,
+            session=self.session_pool,
+            retry=self.retry_policy,
+            rate_limiter=self._get_rate_limiter(),
+        )
         return err, response
 
 
@@ -93,6 +342,237 @@ class Efetch(Eutil):
         return err, response
 
 
+class Esearch(Eutil):
+    """
+    A class tailored for the ESEARCH E-Utility
+
+    Class attributes
+    ----------
+    url : str
+        The E-Utilities URL for ESEARCH
+
+    Attributes
+    ----------
+    db : DbEnum
+        The database to search (default pubmed)
+    usehistory : bool
+        Post the matching ids to the history server, to retrieve with a WebEnv and query_key (default True)
+    retmax : int
+        Maximum number of ids to return in the response (default 0 with usehistory, else 10000)
+
+    Methods
+    ----------
+    search(term: str, webenv: Optional[str] = None) -> Tuple[Optional[Exception], Optional[SearchResult]]
+        Run the query, optionally appending its results to the history of an existing webenv
+
+    """
+
+    url: ClassVar[str] = f'{Eutil.base_url}esearch.fcgi'
+
+    db: DbEnum = DbEnum.pubmed
+    usehistory: bool = True
+
+    @root_validator(pre=True)
+    def retmax_default(cls, values):
+        """Leave the matching ids on the history server unless retmax is set"""
+        if values.get('usehistory', True) and 'retmax' not in values:
+            values['retmax'] = 0
+        return values
+
+    def _parse_response(self, data: bytes) -> SearchResult:
+        """Return the SearchResult given the server response, or raise ValueError for a reported error"""
+        root = _from_raw(data).getroot()
+        error = root.findtext('ERROR')
+        if error:
+            raise ValueError(error)
+        return SearchResult(
+            total=int(root.findtext('Count', '0')),
+            webenv=root.findtext('WebEnv'),
+            query_key=root.findtext('QueryKey'),
+            ids=[id.text for id in root.iterfind('IdList/Id')],
+        )
+
+    def search(self, term: str, webenv: Optional[str] = None) -> Tuple[Optional[Exception], Optional[SearchResult]]:
+        """Return (error, SearchResult) for the query term"""
+        params: Dict[str, Optional[str]] = {
+            'db': self.db.value,
+            'term': term,
+            'usehistory': 'y' if self.usehistory else None,
+            'WebEnv': webenv,
+        }
+        err, response = self.request(self.url, **params)
+        if err or not response:
+            return err, None
+        try:
+            return None, self._parse_response(response.content)
+        except Exception as e:
+            logger.error(f'Error encountered in search for {term}: {e}')
+            return e, None
+
+
+class Esummary(Eutil):
+    """
+    A class tailored for the ESUMMARY E-Utility, retrieving light document summaries rather than full records
+
+    Class attributes
+    ----------
+    url : str
+        The E-Utilities URL for ESUMMARY
+
+    Attributes
+    ----------
+    db : DbEnum
+        The database to summarize (default pubmed)
+    retmode : RetModeEnum
+        Summary format, either RetModeEnum.json (default) or RetModeEnum.xml
+
+    Methods
+    ----------
+    summarize(ids: List[str])
+        Retrieve the document summaries given the list of ids
+    get_summaries(uids: List[str]) -> Generator[Chunk, None, None]
+        Retrieve the Summaries for uids, retmax at a time
+
+    """
+
+    url: ClassVar[str] = f'{Eutil.base_url}esummary.fcgi'
+
+    db: DbEnum = DbEnum.pubmed
+    retmode: RetModeEnum = RetModeEnum.json
+
+    @validator('retmode')
+    def retmode_is_supported(cls, v):
+        if v not in (RetModeEnum.json, RetModeEnum.xml):
+            raise ValueError(f'Unsupported retmode: {v}')
+        return v
+
+    def summarize(self, ids: List[str]) -> Tuple[Optional[Exception], Any]:
+        """Call ESUMMARY E-Utility for the given ids"""
+        params: Dict[str, Union[str, DbEnum, RetModeEnum]] = {
+            'db': self.db,
+            'id': ','.join(ids),
+            'retmode': self.retmode,
+        }
+        err, response = self.request(self.url, **params)
+        return err, response
+
+    def _parse_response(self, data: bytes) -> List[Summary]:
+        """Return a list of Summaries given the server response"""
+        if self.retmode == RetModeEnum.json:
+            return list(_docsum_parser.parse_json(data))
+        return list(_docsum_parser.parse(_from_raw(data)))
+
+    def _get_chunk(self, ids: List[str]) -> Chunk:
+        """Fetch and parse the summaries for ids"""
+        summaries = None
+        error, response = self.summarize(ids)
+        if not error and response:
+            try:
+                summaries = self._parse_response(response.content)
+            except Exception as e:
+                logger.error(f'Error encountered in parsing summaries: {e}')
+                error = e
+        return Chunk(error, summaries, ids)
+
+    def get_summaries(self, uids: List[str]) -> Generator[Chunk, None, None]:
+        """Yields Chunk error, summaries (possibly empty) and uids"""
+        if self.max_workers > 1:
+            yield from self._get_chunks_concurrent(self._get_chunk, self._chunks(uids, self.retmax))
+            return
+        for ids in self._chunks(uids, self.retmax):
+            yield self._get_chunk(ids)
+
+
+class Elink(Eutil):
+    """
+    A class tailored for the ELINK E-Utility, retrieving the links from records to related records
+
+    Each id is sent as its own parameter so the server links every id separately,
+    many ids to a request, and the links are returned as Link edges.
+
+    Class attributes
+    ----------
+    url : str
+        The E-Utilities URL for ELINK
+
+    Attributes
+    ----------
+    dbfrom : DbEnum
+        The database of the source ids (default pubmed)
+    db : DbEnum
+        The database of the target ids (default pubmed)
+    linkname : str
+        Restrict the links to one kind, e.g. pubmed_pmc or pubmed_pubmed_citedin (default all between dbfrom and db)
+    cmd : LinkCmdEnum
+        ELINK command, neighbor (default) or neighbor_score, which also scores each Link
+
+    Methods
+    ----------
+    link(ids: List[str])
+        Retrieve the links given the list of ids
+    get_links(uids: List[str]) -> Generator[Chunk, None, None]
+        Retrieve the Links for uids, retmax ids at a time
+
+    """
+
+    url: ClassVar[str] = f'{Eutil.base_url}elink.fcgi'
+
+    dbfrom: DbEnum = DbEnum.pubmed
+    db: DbEnum = DbEnum.pubmed
+    linkname: Optional[str] = None
+    cmd: LinkCmdEnum = LinkCmdEnum.neighbor
+
+    def link(self, ids: List[str]) -> Tuple[Optional[Exception], Any]:
+        """Call ELINK E-Utility for the given ids"""
+        params: Dict[str, Union[None, str, List[str], DbEnum, LinkCmdEnum]] = {
+            'dbfrom': self.dbfrom,
+            'db': self.db,
+            'id': ids,
+            'linkname': self.linkname,
+            'cmd': self.cmd,
+        }
+        err, response = self.request(self.url, **params)
+        return err, response
+
+    def _parse_response(self, data: bytes) -> List[Link]:
+        """Return the Links given the server response, or raise ValueError for a reported error"""
+        root = _from_raw(data).getroot()
+        error = root.findtext('ERROR')
+        if error:
+            raise ValueError(error)
+        links = []
+        for link_set in root.iterfind('LinkSet'):
+            source = link_set.findtext('IdList/Id')
+            if not source:
+                continue
+            for link_set_db in link_set.iterfind('LinkSetDb'):
+                linkname = sys.intern(link_set_db.findtext('LinkName', ''))
+                for link in link_set_db.iterfind('Link'):
+                    score = link.findtext('Score')
+                    links.append(Link(source, link.findtext('Id'), linkname, int(score) if score else None))
+        return links
+
+    def _get_chunk(self, ids: List[str]) -> Chunk:
+        """Fetch and parse the links for ids"""
+        links = None
+        error, response = self.link(ids)
+        if not error and response:
+            try:
+                links = self._parse_response(response.content)
+            except Exception as e:
+                logger.error(f'Error encountered in parsing links: {e}')
+                error = e
+        return Chunk(error, links, ids)
+
+    def get_links(self, uids: List[str]) -> Generator[Chunk, None, None]:
+        """Yields Chunk error, links (possibly empty) and uids"""
+        if self.max_workers > 1:
+            yield from self._get_chunks_concurrent(self._get_chunk, self._chunks(uids, self.retmax))
+            return
+        for ids in self._chunks(uids, self.retmax):
+            yield self._get_chunk(ids)
+
+
 class PubMedFetch(Efetch):
     """
     A class that retrieves article information from PubMed
@@ -101,11 +581,27 @@ class PubMedFetch(Efetch):
     ----------
     db : DbEnum
         The pubmed database
+    cache : Optional[CitationCache]
+        Store of previously retrieved Citations, so that only the others are fetched (default None)
+    compact : bool
+        Deliver lightweight CitationRecords rather than Citations (default False)
+    batcher : Optional[AdaptiveBatcher]
+        Tunes the number of records per request, at most retmax, and splits a failed request into halves (default None)
+    stream : bool
+        Parse responses as they are received rather than once read in full, e.g. for PMC full text (default False)
+    fields : Optional[FrozenSet[str]]
+        Citation fields to extract, leaving the others empty, e.g. {'pmid', 'title', 'abstract'} (default all)
 
     Methods
     -------
     fetch(uids: List[str])
         Retrieve text records given the list of uids
+    get_citations(uids: List[str]) -> Generator[Chunk, None, None]
+        Retrieve the Citations for uids, retmax at a time
+    get_citations_status(uids: List[str], attempts: int = 2) -> Generator[StatusChunk, None, None]
+        Retrieve the Citations for uids with the status of each, fetching missing or errored uids again
+    get_search_citations(result: SearchResult) -> Generator[PageChunk, None, None]
+        Retrieve the Citations of an Esearch result from the history server, retmax at a time
 
     """
 
@@ -113,6 +609,22 @@ class PubMedFetch(Efetch):
 
     retmode: RetModeEnum = RetModeEnum.xml
     rettype: Optional[RetTypeEnum]
+    cache: Optional[CitationCache] = None
+    compact: bool = False
+    batcher: Optional[AdaptiveBatcher] = None
+    stream: bool = False
+    fields: Optional[FrozenSet[str]] = None
+
+    fields_are_known = validator('fields', allow_reuse=True)(_check_fields)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _parser_fields(self) -> Optional[FrozenSet[str]]:
+        """The fields to extract, including the id that records are matched on"""
+        if self.fields is None or self.db != DbEnum.pmc:
+            return self.fields
+        return self.fields | {'pmc'}
 
     def fetch(self, ids: List[str]) -> Tuple[Optional[Exception], Any]:
         """Return id, and text (i.e. title + abstract) given a PubMed id"""
@@ -124,39 +636,239 @@ class PubMedFetch(Efetch):
         err, response = self._fetch(db=self.db, id=id, **params)
         return err, response
 
-    def _parse_xml(self, data: bytes) -> List[Citation]:
+    def fetch_history(self, webenv: str, query_key: str, retstart: int) -> Tuple[Optional[Exception], Any]:
+        """Return the retmax records from retstart of a result set on the history server"""
+        params: Dict[str, Union[str, int, RetModeEnum, Optional[RetTypeEnum]]] = {
+            'db': self.db,
+            'WebEnv': webenv,
+            'query_key': query_key,
+            'retstart': retstart,
+            'retmode': self.retmode,
+            'rettype': self.rettype,
+        }
+        err, response = self.request(self.url, **params)
+        return err, response
+
+    def _parse_xml(self, data: bytes) -> List[AnyCitation]:
         """Return a list of Citations given the server response"""
         xml_tree = _from_raw(data)
         root = xml_tree.docinfo.root_name
         if root == DocTypeEnum.pubmedArticleSet:
-            parser = PubmedXmlParser()
+            parser = _get_parser(PubmedXmlParser, self.compact, self._parser_fields())
         elif root == DocTypeEnum.pmcArticleset:
-            parser = PmcXmlParser()
+            parser = _get_parser(PmcXmlParser, self.compact, self._parser_fields())
         else:
             raise ValueError(f'Unsupported DOCTYPE root: {root}')
         records = parser.parse(xml_tree)
         return list(records)
 
-    def _parse_response(self, data: bytes) -> List[Citation]:
+    def _parse_response(self, data: bytes) -> List[AnyCitation]:
         """Delegate to an implementation or raise ValueError."""
         if self.retmode == RetModeEnum.xml and self.rettype is None:
             return self._parse_xml(data)
         else:
             raise ValueError(f'Unsupported retmode: {self.retmode}')
 
-    def _chunks(self, lst: List[str], n: int) -> Generator[List[str], None, None]:
-        """Yield successive n-sized chunks from lst."""
-        for i in range(0, len(lst), n):
-            yield lst[i : i + n]
+    def _iterparse_xml(self, source: XmlSource) -> Generator[AnyCitation, None, None]:
+        """Incrementally parse a PubmedArticleSet or pmc-articleset, identified by its root, yielding each Citation"""
+        parsers: Dict[str, Union[PubmedXmlParser, PmcXmlParser]] = {
+            DocTypeEnum.pubmedArticleSet.value: _get_parser(PubmedXmlParser, self.compact, self._parser_fields()),
+            DocTypeEnum.pmcArticleset.value: _get_parser(PmcXmlParser, self.compact, self._parser_fields()),
+        }
+        records = {DocTypeEnum.pubmedArticleSet.value: 'PubmedArticle', DocTypeEnum.pmcArticleset.value: 'article'}
+        for root_tag, article in _iterparse_records(source, records, skip=PmcXmlParser.skip_tags):
+            yield parsers[root_tag]._get_citation(article)
+
+    def _parse_stream(self, response: Any) -> Tuple[List[AnyCitation], int]:
+        """Return a list of Citations parsed while the server response is received, and its size in bytes"""
+        if self.retmode != RetModeEnum.xml or self.rettype is not None:
+            raise ValueError(f'Unsupported retmode: {self.retmode}')
+        response.raw.decode_content = True
+        try:
+            citations = list(self._iterparse_xml(response.raw))
+            return citations, response.raw.tell()
+        finally:
+            response.close()
+
+    def _read_citations(self, response: Any) -> Tuple[List[AnyCitation], float, int]:
+        """Return the Citations of the server response, the seconds taken to receive it and its size in bytes
+
+        A streamed response is parsed as it is received, so its seconds include parsing.
+        """
+        start = time.perf_counter()
+        if self.stream:
+            citations, nbytes = self._parse_stream(response)
+            return citations, response.elapsed.total_seconds() + time.perf_counter() - start, nbytes
+        data = response.content
+        seconds = response.elapsed.total_seconds() + time.perf_counter() - start
+        return self._parse_response(data), seconds, len(data)
+
+    def _cache_key(self, uid: str) -> str:
+        """Normalize a PubMed or PMC id for use as a cache key"""
+        if self.db == DbEnum.pmc and uid.upper().startswith('PMC'):
+            return uid[3:]
+        return uid
+
+    def _citation_cache_key(self, citation: AnyCitation) -> Optional[str]:
+        uid = citation.pmc if self.db == DbEnum.pmc else citation.pmid
+        return self._cache_key(uid) if uid else None
+
+    def _get_chunk_cached(self, ids: List[str], cache: CitationCache) -> Chunk:
+        """Fetch and parse the records for ids not in the cache, then combine in order of ids
+
+        Projected records, with only some fields, are not added to the cache.
+        """
+        keys = [self._cache_key(id) for id in ids]
+        cached = cache.get_many(self.db.value, keys)
+        found: Dict[str, AnyCitation] = {
+            key: _project(CitationRecord.from_citation(citation) if self.compact else citation, self.fields)
+            for key, citation in cached.items()
+        }
+        misses = [id for id, key in zip(ids, keys) if key not in found]
+        unmatched: List[AnyCitation] = []
+        if misses:
+            error, records = self._fetch_citations(misses)
+            if error or records is None:
+                return Chunk(error, None, ids)
+            fetched: Dict[str, AnyCitation] = {}
+            for citation in records:
+                key = self._citation_cache_key(citation)
+                if key is None or key in fetched:
+                    unmatched.append(citation)
+                else:
+                    fetched[key] = citation
+            if self.fields is None:
+                cache.put_many(self.db.value, {key: _to_citation(citation) for key, citation in fetched.items()})
+            found.update(fetched)
+        citations = [found.pop(key) for key in keys if key in found]
+        return Chunk(None, citations + list(found.values()) + unmatched, ids)
+
+    def _fetch_citations(self, ids: List[str]) -> Tuple[Optional[Exception], Optional[List[AnyCitation]]]:
+        """Fetch and parse the records for ids; with a batcher, record the outcome and return read or parse errors"""
+        error, response = self.fetch(ids)
+        if error or not response:
+            if self.batcher is not None:
+                self.batcher.record_error()
+            return error, None
+        if self.batcher is None:
+            return None, self._parse_stream(response)[0] if self.stream else self._parse_response(response.content)
+        try:
+            citations, seconds, nbytes = self._read_citations(response)
+        except Exception as e:
+            logger.error(f'Error encountered in fetch of {len(ids)} records: {e}')
+            self.batcher.record_error()
+            return e, None
+        self.batcher.record(len(ids), seconds, nbytes)
+        return None, citations
+
+    def _get_chunk(self, ids: List[str]) -> Chunk:
+        """Fetch and parse the records for ids"""
+        if self.cache is not None:
+            return self._get_chunk_cached(ids, self.cache)
+        error, citations = self._fetch_citations(ids)
+        return Chunk(error, citations, ids)
+
+    def _is_splittable(self, error: Exception) -> bool:
+        """Whether a smaller request might succeed, i.e. the error is not a client error like a bad parameter"""
+        return not isinstance(error, RequestsError) or self.retry_policy.is_retryable(error)
+
+    def _get_chunks(self, ids: List[str]) -> List[Chunk]:
+        """Fetch and parse the records for ids, with a batcher retrying a failed request as halves"""
+        chunk = self._get_chunk(ids)
+        if self.batcher is None or chunk.error is None or len(ids) < 2 * self.batcher.minimum:
+            return [chunk]
+        if not self._is_splittable(chunk.error):
+            return [chunk]
+        logger.warning(f'Splitting fetch of {len(ids)} records after error: {chunk.error}')
+        half = (len(ids) + 1) // 2
+        return self._get_chunks(ids[:half]) + self._get_chunks(ids[half:])
+
+    def _batches(self, uids: List[str]) -> Generator[List[str], None, None]:
+        """Yield successive batches of uids, retmax at a time or, with a batcher, its size at the time"""
+        if self.batcher is None:
+            yield from self._chunks(uids, self.retmax)
+            return
+        start = 0
+        while start < len(uids):
+            size = min(self.batcher.size, self.retmax)
+            yield uids[start : start + size]
+            start += size
+
+    def _get_history_chunk(self, result: SearchResult, retstart: int) -> PageChunk:
+        """Fetch and parse the page of a history server result set from retstart"""
+        citations = None
+        ids = None
+        error, response = self.fetch_history(str(result.webenv), str(result.query_key), retstart)
+        if not error and response:
+            try:
+                citations = self._parse_response(response.content)
+            except Exception as e:
+                logger.error(f'Error encountered in parsing {result.query_key} from {retstart}: {e}')
+                return PageChunk(e, None, ids, retstart)
+            uids = [citation.pmc if self.db == DbEnum.pmc else citation.pmid for citation in citations]
+            ids = [uid for uid in uids if uid is not None]
+        else:
+            logger.error(f'Error encountered in fetch of {result.query_key} from {retstart}: {error}')
+        return PageChunk(error, citations, ids, retstart)
 
     def get_citations(self, uids: List[str]) -> Generator[Chunk, None, None]:
         """Yields Chunk error, citations (possibly empty) and PubMed uids"""
-        for ids in self._chunks(uids, self.retmax):
-            citations = None
-            error, response = self.fetch(ids)
-            if not error and response:
-                citations = self._parse_response(response.content)
-            yield Chunk(error, citations, ids)
+        if self.max_workers > 1:
+            for chunks in self._get_chunks_concurrent(self._get_chunks, self._batches(uids)):
+                yield from chunks
+            return
+        for ids in self._batches(uids):
+            yield from self._get_chunks(ids)
+
+    def _get_status(self, chunk: Chunk) -> Dict[str, IdStatusEnum]:
+        """Status of each id of a Chunk, matched to the Citations by PubMed or PMC id"""
+        ids = chunk.ids or []
+        if chunk.error is not None or chunk.citations is None:
+            return {id: IdStatusEnum.errored for id in ids}
+        keys = {self._citation_cache_key(citation) for citation in chunk.citations}
+        return {id: IdStatusEnum.found if self._cache_key(id) in keys else IdStatusEnum.missing for id in ids}
+
+    def get_citations_status(self, uids: List[str], attempts: int = 2) -> Generator[StatusChunk, None, None]:
+        """Yields StatusChunk error, citations, uids and their status, each uid once with its final status
+
+        uids missing from a response or in a failed request are fetched again in later batches,
+        up to attempts times in all, and are only reported once found or out of attempts.
+        """
+        if attempts < 1:
+            raise ValueError('Must make at least one attempt')
+        pending = uids
+        for attempt in range(1, attempts + 1):
+            requeued: List[str] = []
+            for chunk in self.get_citations(pending):
+                status = self._get_status(chunk)
+                if attempt < attempts:
+                    retry = [id for id, id_status in status.items() if id_status != IdStatusEnum.found]
+                    if retry:
+                        logger.warning(f'Fetching {len(retry)} records again after attempt {attempt}')
+                    requeued.extend(retry)
+                    status = {id: id_status for id, id_status in status.items() if id_status == IdStatusEnum.found}
+                    if not status and not chunk.citations:
+                        continue
+                yield StatusChunk(chunk.error, chunk.citations, list(status), status)
+            if not requeued:
+                return
+            pending = requeued
+
+    def get_search_citations(self, result: SearchResult) -> Generator[PageChunk, None, None]:
+        """Yields PageChunk error, citations, ids and retstart for each page of retmax records on the history server
+
+        The ids of a failed page are None, as they are known only from its records.
+        """
+        if result.webenv is None or result.query_key is None:
+            raise ValueError('SearchResult is not on the history server; search with usehistory')
+        retstarts = range(self.retstart, result.total, self.retmax)
+        if self.max_workers > 1:
+            yield from self._get_chunks_concurrent(
+                lambda retstart: self._get_history_chunk(result, retstart), retstarts
+            )
+            return
+        for retstart in retstarts:
+            yield self._get_history_chunk(result, retstart)
 
 
 class PubMedDownload(BaseModel):
@@ -171,11 +883,37 @@ class PubMedDownload(BaseModel):
         Base path for Daily update files
     baselinefiles_path: str
         Base path for Annual baseline files
+    session_pool : SessionPool
+        Pooled keep-alive connections used for requests (default shared with Eutil)
+    retry_policy : RetryPolicy
+        Retries and counters for failed requests (default shared with Eutil)
+    listing_ttl : float
+        Seconds for which a directory listing is reused (default 300)
 
     Attributes
     ----------
     retmax : int
-        Maximum number of records to return (default 10000)
+        Maximum number of records to return in a streamed Chunk (default 10000)
+    stream : bool
+        Decompress and parse each file as it downloads, rather than once it has arrived (default False)
+    max_downloads : int
+        Number of files to download concurrently; above 1, files are parsed in a process pool and stream
+        is not supported (default 1)
+    max_parsers : Optional[int]
+        Number of parser processes for concurrent downloads (default number of CPUs)
+    mp_context : Optional[BaseContext]
+        Multiprocessing context that starts parser processes (default spawn, which re-imports the
+        caller's __main__ module, so scripts must guard their entry point with if __name__ == '__main__')
+    max_pending : Optional[int]
+        Maximum number of files downloaded or parsed but not yet yielded (default 2 * max_downloads)
+    ordered : bool
+        Yield concurrently retrieved Chunks in the order of files rather than as completed (default True)
+    compact : bool
+        Deliver lightweight CitationRecords rather than Citations (default False)
+    fields : Optional[FrozenSet[str]]
+        Citation fields to extract, leaving the others empty, e.g. {'pmid', 'title', 'abstract'} (default all)
+    metrics : Optional[Metrics]
+        Record the time spent in, and the bytes and articles passing through, each stage (default None)
 
     Methods
     ----------
@@ -184,38 +922,308 @@ class PubMedDownload(BaseModel):
     get_citations(files: List[str],
       download_path: DownloadPathEnum = DownloadPathEnum.updateFiles) -> Generator[Chunk, None, None]
         Retrieve the Citations from the indicated files, optional path from DownloadPathEnum
+    stream_citations(file: str,
+      download_path: DownloadPathEnum = DownloadPathEnum.updateFiles) -> Generator[Citation, None, None]
+        Retrieve the Citations from the indicated file, each as soon as it has been downloaded
+    get_updates(files: List[str],
+      download_path: DownloadPathEnum = DownloadPathEnum.updatefiles) -> Generator[Update, None, None]
+        Retrieve the Citations from the indicated files along with the records each deletes
+    list_files(download_path: DownloadPathEnum = DownloadPathEnum.updatefiles,
+      year: Optional[int] = None, start: Optional[int] = None, end: Optional[int] = None) -> List[RemoteFile]
+        List the data files available, optionally those of a year or within a range of sequence numbers
     """
 
     base_url: ClassVar[str] = 'https://ftp.ncbi.nlm.nih.gov/pubmed/'
     updatefiles_path: ClassVar[str] = 'updatefiles'
     baselinefiles_path: ClassVar[str] = 'baseline'
+    session_pool: ClassVar[SessionPool] = default_session_pool
+    retry_policy: ClassVar[RetryPolicy] = default_retry_policy
+    listing_ttl: ClassVar[float] = 300
+    _listings: ClassVar[Dict[str, Tuple[float, List[RemoteFile]]]] = {}
+    _listings_lock: ClassVar[Lock] = Lock()
+
+    retmax: int = Eutil.retmax_limit
+    stream: bool = False
+    max_downloads: int = 1
+    max_parsers: Optional[int] = None
+    mp_context: Optional[BaseContext] = None
+    max_pending: Optional[int] = None
+    ordered: bool = True
+    compact: bool = False
+    fields: Optional[FrozenSet[str]] = None
+    metrics: Optional[Metrics] = None
+
+    fields_are_known = validator('fields', allow_reuse=True)(_check_fields)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    @validator('retmax', 'max_downloads', 'max_parsers', 'max_pending')
+    def is_positive(cls, v):
+        if v is None:
+            return v
+        if v < 1:
+            raise ValueError('Must be a positive number')
+        return v
+
+    @validator('max_downloads')
+    def is_not_streamed(cls, v, values):
+        if v > 1 and values.get('stream'):
+            raise ValueError('Concurrent downloads are not streamed; set stream or max_downloads above 1, not both')
+        return v
 
-    def _request(self, url: str) -> Tuple[Optional[Exception], Any]:
-        """Retrieve from NCBI PubMed download sites and return (error, requests.Response)"""
-        err, response = safe_requests(url, method=HttpMethodEnum.GET, stream=True)
+    def _request(
+        self, url: str, headers: Optional[Dict[str, str]] = None, read_body: bool = False
+    ) -> Tuple[Optional[Exception], Any]:
+        """Retrieve from NCBI PubMed download sites and return (error, requests.Response)
+
+        With read_body, the body is read, and a failed read retried, before returning.
+        """
+        with _timer(self.metrics, 'request'):
+            err, response = safe_requests(
+                url,
+                method=HttpMethodEnum.GET,
+                headers=headers or {},
+                stream=True,
+                session=self.session_pool,
+                retry=self.retry_policy,
+                read_body=read_body,
+            )
         return err, response
 
-    def _parse_xml(self, data: bytes) -> List[Citation]:
+    def _read(self, response: Any) -> bytes:
+        """The entire response body"""
+        with _timer(self.metrics, 'download'):
+            data = response.content
+        _count(self.metrics, 'bytes:download', len(data))
+        return data
+
+    def _decompress(self, data: bytes) -> bytes:
+        with _timer(self.metrics, 'decompress'):
+            decompressed = gzip.decompress(data)
+        _count(self.metrics, 'bytes:decompress', len(decompressed))
+        return decompressed
+
+    def _parse_tree(self, data: bytes) -> XmlTree:
+        with _timer(self.metrics, 'from_raw'):
+            return _from_raw(data)
+
+    def _parser(self) -> PubmedXmlParser:
+        """The shared parser for the options, or one of its own recording field timings to metrics"""
+        if self.metrics is None:
+            return _get_parser(PubmedXmlParser, self.compact, self.fields)
+        return PubmedXmlParser(compact=self.compact, fields=self.fields, metrics=self.metrics)
+
+    def _parse_xml(self, data: bytes) -> List[AnyCitation]:
         """Return a list of Citations given the server response"""
-        parser = PubmedXmlParser()
-        xml_tree = _from_raw(data)
-        records = parser.parse(xml_tree)
-        return list(records)
+        parser = self._parser()
+        xml_tree = self._parse_tree(data)
+        with _timer(self.metrics, 'parse'):
+            records = list(parser.parse(xml_tree))
+        return records
 
-    def _parse_response(self, data: bytes) -> List[Citation]:
+    def _parse_response(self, data: bytes) -> List[AnyCitation]:
         """Delegate to an implementation or raise ValueError."""
-        decompressed = gzip.decompress(data)
+        decompressed = self._decompress(data)
         return self._parse_xml(decompressed)
 
+    def _parse_response_counted(self, data: bytes) -> Tuple[List[AnyCitation], Dict[str, float]]:
+        """Parse in a worker process, returning the counters recorded by its copy of metrics"""
+        citations = self._parse_response(data)
+        return citations, self.metrics.counters if self.metrics is not None else {}
+
+    def _parse_updates_response(self, data: bytes) -> Tuple[List[AnyCitation], List[DeletedCitation]]:
+        """Decompress and parse to the citations and the deleted records"""
+        parser = self._parser()
+        citations: List[AnyCitation] = []
+        deletions: List[DeletedCitation] = []
+        xml_tree = self._parse_tree(self._decompress(data))
+        with _timer(self.metrics, 'parse'):
+            for item in parser.parse_updates(xml_tree):
+                if isinstance(item, DeletedCitation):
+                    deletions.append(item)
+                else:
+                    citations.append(item)
+        return citations, deletions
+
+    def _iterparse_response(self, response: Any) -> Generator[AnyCitation, None, None]:
+        """Incrementally decompress and parse the response body, yielding Citations as each article closes"""
+        response.raw.decode_content = True
+        try:
+            with gzip.GzipFile(fileobj=response.raw) as source:
+                parser = self._parser()
+                yield from parser.iterparse(source)
+        finally:
+            if self.metrics is not None:
+                self.metrics.count('bytes:download', response.raw.tell())
+            response.close()
+
+    def _stream_chunks(self, response: Any, ids: List[str]) -> Generator[Chunk, None, None]:
+        """Yields Chunks of at most retmax Citations from a streamed response"""
+        citations: List[AnyCitation] = []
+        is_empty = True
+        try:
+            for citation in self._iterparse_response(response):
+                citations.append(citation)
+                if len(citations) == self.retmax:
+                    yield Chunk(None, citations, ids)
+                    citations = []
+                    is_empty = False
+        except Exception as e:
+            logger.error(f'Error encountered in streaming {ids}: {e}')
+            yield Chunk(e, citations, ids)
+            return
+        if citations or is_empty:
+            yield Chunk(None, citations, ids)
+
+    def stream_citations(
+        self, file: str, download_path: DownloadPathEnum = DownloadPathEnum.updatefiles
+    ) -> Generator[AnyCitation, None, None]:
+        """Yields Citations from a file while it downloads, raising any request error"""
+        file_url = f'{self.base_url}{DownloadPathEnum(download_path).value}/{file}'
+        error, response = self._request(file_url)
+        if error:
+            raise error
+        yield from self._iterparse_response(response)
+
+    def _download(self, url: str) -> Tuple[Optional[Exception], Optional[bytes]]:
+        """Retrieve the entire body from NCBI PubMed download sites and return (error, bytes)"""
+        data = None
+        error, response = self._request(url, read_body=True)
+        if not error and response:
+            try:
+                data = self._read(response)
+            except Exception as e:
+                logger.error(f'Error encountered in download of {url}: {e}')
+                error = e
+        return error, data
+
+    def _get_citations_concurrent(self, files: List[str], url: str) -> Generator[Chunk, None, None]:
+        """Yields Chunks for files downloaded in a thread pool and parsed in a process pool
+
+        At most max_pending files are held between download and being yielded. Parser processes are
+        spawned by default rather than forked, as forking while download threads hold locks can deadlock
+        the children.
+        """
+        max_pending = self.max_pending or 2 * self.max_downloads
+        queued = iter(enumerate(files))
+        pending: Dict[Future, Tuple[int, List[str], bool]] = {}
+        completed: Dict[int, Chunk] = {}
+        next_index = 0
+
+        mp_context = self.mp_context or multiprocessing.get_context('spawn')
+        parsers = ProcessPoolExecutor(self.max_parsers, mp_context=mp_context)
+        with ThreadPoolExecutor(self.max_downloads) as downloads, parsers:
+
+            def submit_downloads() -> None:
+                while len(pending) + len(completed) < max_pending:
+                    queued_file = next(queued, None)
+                    if queued_file is None:
+                        return
+                    index, file = queued_file
+                    pending[downloads.submit(self._download, f'{url}/{file}')] = (index, [file], True)
+
+            submit_downloads()
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index, ids, is_download = pending.pop(future)
+                    if is_download:
+                        error, data = future.result()
+                        if not error:
+                            pending[parsers.submit(self._parse_response_counted, data)] = (index, ids, False)
+                            continue
+                        completed[index] = Chunk(error, None, ids)
+                    else:
+                        try:
+                            citations, counters = future.result()
+                            if self.metrics is not None:
+                                self.metrics.update(counters)
+                            completed[index] = Chunk(None, citations, ids)
+                        except Exception as e:
+                            logger.error(f'Error encountered in parsing {ids}: {e}')
+                            completed[index] = Chunk(e, None, ids)
+
+                if self.ordered:
+                    while next_index in completed:
+                        yield completed.pop(next_index)
+                        next_index += 1
+                else:
+                    for index in list(completed):
+                        yield completed.pop(index)
+                submit_downloads()
+
+    def get_updates(
+        self, files: List[str], download_path: DownloadPathEnum = DownloadPathEnum.updatefiles
+    ) -> Generator[Update, None, None]:
+        """Yields Update error, citations, deleted records and the file for each of files, in order"""
+        url = f'{self.base_url}{DownloadPathEnum(download_path).value}'
+        for file in files:
+            citations = deletions = None
+            error, data = self._download(f'{url}/{file}')
+            if not error and data is not None:
+                try:
+                    citations, deletions = self._parse_updates_response(data)
+                except Exception as e:
+                    logger.error(f'Error encountered in parsing {file}: {e}')
+                    error = e
+            yield Update(error, citations, deletions, [file])
+
+    def _get_listing(self, url: str) -> List[RemoteFile]:
+        """The data files listed at url, reusing a listing retrieved within listing_ttl seconds"""
+        now = time.monotonic()
+        with self._listings_lock:
+            listed = self._listings.get(url)
+        if listed is not None and now - listed[0] < self.listing_ttl:
+            return listed[1]
+        error, response = self._request(f'{url}/')
+        if error:
+            raise error
+        files = _parse_listing(response.text)
+        with self._listings_lock:
+            self._listings[url] = (now, files)
+        return files
+
+    def list_files(
+        self,
+        download_path: DownloadPathEnum = DownloadPathEnum.updatefiles,
+        year: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> List[RemoteFile]:
+        """List the data files under download_path, of year (e.g. 2022) and sequence numbers start to end inclusive"""
+        url = f'{self.base_url}{DownloadPathEnum(download_path).value}'
+        return [
+            file
+            for file in self._get_listing(url)
+            if (year is None or file.year == year)
+            and (start is None or file.sequence >= start)
+            and (end is None or file.sequence <= end)
+        ]
+
     def get_citations(
         self, files: List[str], download_path: DownloadPathEnum = DownloadPathEnum.updatefiles
     ) -> Generator[Chunk, None, None]:
-        url = f'{self.base_url}{download_path}'
+        url = f'{self.base_url}{DownloadPathEnum(download_path).value}'
+        if self.max_downloads > 1:
+            yield from self._get_citations_concurrent(files, url)
+            return
         for file in files:
             ids = [file]
             file_url = f'{url}/{file}'
             citations = None
-            error, response = self._request(file_url)
-            if not error and response:
-                citations = self._parse_response(response.content)
+            if self.stream:
+                error, response = self._request(file_url)
+                if not error and response:
+                    yield from self._stream_chunks(response, ids)
+                    continue
+                yield Chunk(error, citations, ids)
+                continue
+            error, data = self._download(file_url)
+            if not error and data is not None:
+                try:
+                    citations = self._parse_response(data)
+                except Exception as e:
+                    logger.error(f'Error encountered in parsing {ids}: {e}')
+                    error = e
             yield Chunk(error, citations, ids)
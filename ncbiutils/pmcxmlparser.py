@@ -1,10 +1,24 @@
-from pydantic import BaseModel
-from typing import Optional, List, Generator, Dict, Any
+from pydantic import BaseModel, validator
+from typing import ClassVar, Optional, List, Generator, Dict, Tuple, Any, Union, FrozenSet
 from typing_extensions import TypeAlias
-from ncbiutils.pubmed import Citation, Author, Journal
+import sys
+from ncbiutils.pubmed import (
+    Citation,
+    Author,
+    Journal,
+    CitationRecord,
+    AuthorRecord,
+    JournalRecord,
+    AnyCitation,
+    _intern,
+    _check_fields,
+    _unselected,
+)
 from ncbiutils.xml import (
     Element,
     XmlTree,
+    XmlSource,
+    _iterparse,
     _find_safe,
     _text_safe,
     _find_all,
@@ -24,55 +38,116 @@ PmcArticle: TypeAlias = Element
 PmcArticleSet: TypeAlias = Element
 
 
+class References:
+    """The aff and author-notes corresp elements of an article's front matter by id, each with its text extracted once
+
+    Built in a single pass over the front matter and shared by all of its authors, so resolving
+    author xrefs takes time linear in the size of the front matter.
+    """
+
+    def __init__(self, pmc_article: PmcArticle):
+        self._elements: Dict[Tuple[str, str], Element] = {}
+        front = pmc_article.find('front')
+        for element in front.iter('aff', 'corresp') if front is not None else []:
+            rid = element.get('id')
+            if rid is None or element.tag == 'corresp' and element.getparent().tag != 'author-notes':
+                continue
+            self._elements.setdefault((element.tag, rid), element)
+        self._affiliations: Dict[str, Optional[str]] = {}
+        self._emails: Dict[str, List[str]] = {}
+
+    def affiliation(self, rid: str) -> Optional[str]:
+        """Text of the aff with id rid, or None if there is none"""
+        if rid not in self._affiliations:
+            aff = self._elements.get(('aff', rid))
+            self._affiliations[rid] = _collect_element_text(aff) if aff is not None else None
+        return self._affiliations[rid]
+
+    def emails(self, rid: str) -> List[str]:
+        """Emails of the corresp with id rid, possibly empty"""
+        if rid not in self._emails:
+            corresp = self._elements.get(('corresp', rid))
+            emails = _find_all(corresp, './/email') if corresp is not None else []
+            self._emails[rid] = [_collect_element_text(email) for email in emails]
+        return self._emails[rid]
+
+
 class PmcXmlParser(BaseModel):
     """
     Capabilities to parse PubMedCentral XML.
     See DTD https://dtd.nlm.nih.gov/ncbi/pmc/articleset/nlm-articleset-2.0.dtd
 
+    Article-level lookups are anchored at front, so they never walk the body or back matter.
+
+    Class attributes
+    ----------
+    skip_tags : Tuple[str, ...]
+        Article parts that hold no citation metadata, cleared while streaming
+
+    Attributes
+    ----------
+    compact : bool
+        Emit lightweight CitationRecords rather than Citations (default False)
+    fields : Optional[FrozenSet[str]]
+        Citation fields to extract, leaving the others empty, e.g. {'pmid', 'title', 'abstract'} (default all)
+
     Methods
     ----------
     parse(data: bytes) -> Generator[Citation, None, None]
         Return a list of article data given pmc-articleset bytes
+    iterparse(source: XmlSource) -> Generator[Citation, None, None]
+        Return article data as it is read from a pmc-articleset stream
     """
 
+    skip_tags: ClassVar[Tuple[str, ...]] = ('body', 'back')
+
+    compact: bool = False
+    fields: Optional[FrozenSet[str]] = None
+
+    fields_are_known = validator('fields', allow_reuse=True)(_check_fields)
+
+    def _selects(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
     def _get_pmid(self, pmc_article: PmcArticle) -> Optional[str]:
-        pmid = _text_safe(pmc_article, './/front/article-meta/article-id[@pub-id-type="pmid"]')
+        pmid = _text_safe(pmc_article, 'front/article-meta/article-id[@pub-id-type="pmid"]')
         return pmid
 
     def _get_doi(self, pmc_article: PmcArticle) -> Optional[str]:
-        doi = _text_safe(pmc_article, './/front/article-meta/article-id[@pub-id-type="doi"]')
+        doi = _text_safe(pmc_article, 'front/article-meta/article-id[@pub-id-type="doi"]')
         return doi
 
     def _get_pmc(self, pmc_article: PmcArticle) -> Optional[str]:
-        pmc = _text_safe(pmc_article, './/front/article-meta/article-id[@pub-id-type="pmc"]')
+        pmc = _text_safe(pmc_article, 'front/article-meta/article-id[@pub-id-type="pmc"]')
         return pmc
 
     def _get_abstract(self, pmc_article: PmcArticle) -> Optional[str]:
         abstract = []
-        abstracts = _find_all(pmc_article, './/front/article-meta/abstract')
+        abstracts = _find_all(pmc_article, 'front/article-meta/abstract')
         for abstract_elt in abstracts:
             abstract.append(_collect_element_text(abstract_elt))
         return ' '.join(abstract) if len(abstract) > 0 else None
 
     def _get_title(self, pmc_article: PmcArticle) -> str:
-        title = pmc_article.find('.//front/article-meta/title-group/article-title')
+        title = pmc_article.find('front/article-meta/title-group/article-title')
         text = _collect_element_text(title)
         return text
 
     def _get_iso_abbreviation(self, pmc_article: PmcArticle) -> Optional[str]:
-        text = _text_safe(pmc_article, './/front/journal-meta/journal-id[@journal-id-type="iso-abbrev"]')
+        text = _text_safe(pmc_article, 'front/journal-meta/journal-id[@journal-id-type="iso-abbrev"]')
         return text
 
-    def _get_affiliations(self, author: Element, pmc_article: PmcArticle) -> Optional[List[str]]:
+    def _get_affiliations(self, author: Element, references: References) -> Optional[List[str]]:
         alist = []
         affiliation_xrefs = _find_all(author, './/xref[@ref-type="aff"]')
         rids = [affiliation_xref.get('rid') for affiliation_xref in affiliation_xrefs]
         for rid in rids:
-            aff = pmc_article.find(f'.//aff[@id="{rid}"]')
-            alist.append(_collect_element_text(aff))
+            affiliation = references.affiliation(rid)
+            if affiliation is not None:
+                alist.append(affiliation)
         return alist if len(alist) > 0 else None
 
-    def _get_emails(self, author: Element, pmc_article: PmcArticle) -> Optional[List[str]]:
+    def _get_emails(self, author: Element, references: References) -> Optional[List[str]]:
         emails: List[str] = []
         contrib_emails = _find_all(author, './/email')
         corresp_xrefs = _find_all(author, './/xref[@ref-type="corresp"]')
@@ -81,27 +156,27 @@ class PmcXmlParser(BaseModel):
             emails.append(_collect_element_text(contrib_email))
         # referenced within <contrib>
         for corresp_xref in corresp_xrefs:
-            rid = corresp_xref.get('rid')
-            corresp_elt = _find_safe(pmc_article, f'.//author-notes/corresp[@id="{rid}"]')
-            corresp_emails = _find_all(corresp_elt, './/email')
-            for corresp_email in corresp_emails:
-                emails.append(_collect_element_text(corresp_email))
+            emails.extend(references.emails(corresp_xref.get('rid')))
         return unique_list(emails) if len(emails) > 0 else None
 
-    def _get_author(self, author: Element, pmc_article: PmcArticle) -> Author:
-        return Author(
+    def _get_author(self, author: Element, references: References) -> Union[Author, AuthorRecord]:
+        make_author = AuthorRecord if self.compact else Author
+        return make_author(
             fore_name=_text_safe(author, './/name/given-names'),
             last_name=_text_safe(author, './/name/surname'),
             initials=None,
             collective_name=None,
             orcid=_text_safe(author, './/contrib-id[@contrib-id-type="orcid"]'),
-            affiliations=self._get_affiliations(author, pmc_article),
-            emails=self._get_emails(author, pmc_article),
+            affiliations=self._get_affiliations(author, references),
+            emails=self._get_emails(author, references),
         )
 
-    def _get_author_list(self, pmc_article: PmcArticle) -> Optional[List[Author]]:
-        authors = _find_all(pmc_article, './/front/article-meta/contrib-group/contrib[@contrib-type="author"]')
-        author_list = [self._get_author(author, pmc_article) for author in authors]
+    def _get_author_list(self, pmc_article: PmcArticle) -> Optional[List[Any]]:
+        authors = _find_all(pmc_article, 'front/article-meta/contrib-group/contrib[@contrib-type="author"]')
+        if not authors:
+            return None
+        references = References(pmc_article)
+        author_list = [self._get_author(author, references) for author in authors]
         return author_list if len(author_list) > 0 else None
 
     def _get_PmcArticleSet(self, xml_tree: XmlTree) -> PmcArticleSet:
@@ -110,12 +185,12 @@ class PmcXmlParser(BaseModel):
             raise ValueError('XML document does not contain a pmc-articleset')
         return pmc_article_set
 
-    def _get_journal(self, pmc_article: PmcArticle) -> Journal:
-        journal = _find_safe(pmc_article, './/front/journal-meta')
+    def _get_journal(self, pmc_article: PmcArticle) -> Union[Journal, JournalRecord]:
+        journal = _find_safe(pmc_article, 'front/journal-meta')
         issn = [_collect_element_text(issn) for issn in _find_all(journal, './/issn')]
         title = _text_safe(journal, './/journal-title-group/journal-title')
         iso_abbreviation = self._get_iso_abbreviation(pmc_article)
-        article = _find_safe(pmc_article, './/front/article-meta')
+        article = _find_safe(pmc_article, 'front/article-meta')
         volume = _text_safe(article, './/volume')
         issue = _text_safe(article, './/issue')
         pub_date = _find_safe(article, './/pub-date')
@@ -123,7 +198,12 @@ class PmcXmlParser(BaseModel):
             pub_year = _text_safe(pub_date, './/year')
             pub_month = _text_safe(pub_date, './/month')
             pub_day = _text_safe(pub_date, './/day')
-        return Journal(
+        if self.compact:
+            issn = [sys.intern(value) for value in issn]
+            title = _intern(title)
+            iso_abbreviation = _intern(iso_abbreviation)
+        make_journal = JournalRecord if self.compact else Journal
+        return make_journal(
             issn=issn,
             title=title,
             iso_abbreviation=iso_abbreviation,
@@ -136,7 +216,7 @@ class PmcXmlParser(BaseModel):
 
     def _get_correspondence(self, pmc_article: PmcArticle) -> List[Dict[str, Any]]:
         correspondence = []
-        corresp_elts = _find_all(pmc_article, './/author-notes/corresp')
+        corresp_elts = _find_all(pmc_article, 'front/article-meta/author-notes/corresp')
         for corresp_elt in corresp_elts:
             emails = []
             corresp_emails = _find_all(corresp_elt, './/email')
@@ -146,29 +226,38 @@ class PmcXmlParser(BaseModel):
             correspondence.append({'emails': emails, 'notes': notes})
         return correspondence
 
-    def parse(self, xml_tree: XmlTree) -> Generator[Citation, None, None]:
+    def _get_citation(self, pmc_article: PmcArticle) -> AnyCitation:
+        selects = self._selects
+        citation = _unselected(self.fields, self.compact)
+        citation['pmid'] = self._get_pmid(pmc_article)
+        if selects('pmc'):
+            citation['pmc'] = self._get_pmc(pmc_article)
+        if selects('doi'):
+            citation['doi'] = self._get_doi(pmc_article)
+        if selects('title'):
+            citation['title'] = self._get_title(pmc_article)
+        if selects('abstract'):
+            citation['abstract'] = self._get_abstract(pmc_article)
+        if selects('author_list'):
+            citation['author_list'] = self._get_author_list(pmc_article)
+        if selects('journal'):
+            citation['journal'] = self._get_journal(pmc_article)
+        if selects('publication_type_list'):
+            citation['publication_type_list'] = []
+        if selects('correspondence'):
+            citation['correspondence'] = self._get_correspondence(pmc_article)
+        make_citation = CitationRecord if self.compact else Citation
+        return make_citation(**citation)
+
+    def parse(self, xml_tree: XmlTree) -> Generator[AnyCitation, None, None]:
         """Parse an XML document to a list of custom citations"""
         pmc_article_set = self._get_PmcArticleSet(xml_tree)
-        pmc_articles = _find_all(pmc_article_set, './/article')
+        pmc_articles = _find_all(pmc_article_set, 'article')
 
         for pmc_article in pmc_articles:
-            pmid = self._get_pmid(pmc_article)
-            pmc = self._get_pmc(pmc_article)
-            doi = self._get_doi(pmc_article)
-            title = self._get_title(pmc_article)
-            abstract = self._get_abstract(pmc_article)
-            author_list = self._get_author_list(pmc_article)
-            journal = self._get_journal(pmc_article)
-            correspondence = self._get_correspondence(pmc_article)
-            citation = Citation(
-                pmid=pmid,
-                pmc=pmc,
-                title=title,
-                doi=doi,
-                abstract=abstract,
-                author_list=author_list,
-                journal=journal,
-                publication_type_list=[],
-                correspondence=correspondence,
-            )
-            yield citation
+            yield self._get_citation(pmc_article)
+
+    def iterparse(self, source: XmlSource) -> Generator[AnyCitation, None, None]:
+        """Parse an XML stream to custom citations, clearing article body and back matter as they are read"""
+        for pmc_article in _iterparse(source, 'article', 'pmc-articleset', skip=self.skip_tags):
+            yield self._get_citation(pmc_article)
@@ -1,5 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, NamedTuple, Union, FrozenSet
+from typing_extensions import TypeAlias
+import sys
 
 
 #############################
@@ -98,6 +100,8 @@ class Citation(BaseModel):
     correspondence: List[Dict[str, Any]]
     mesh_list
         Collection of MeSH DescriptorName, QualifierName(s)
+    version : Optional[str]
+        Version of the PubMed record, revised records having a version above 1
     """
 
     pmid: str
@@ -110,3 +114,193 @@ class Citation(BaseModel):
     publication_type_list: List[str]
     correspondence: List[Dict[str, Any]]
     mesh_list: Optional[List[Dict[str, Any]]]
+    version: Optional[str]
+
+
+class AuthorRecord(NamedTuple):
+    """A lightweight, unvalidated counterpart of Author, with the same fields"""
+
+    fore_name: Optional[str]
+    last_name: Optional[str]
+    initials: Optional[str]
+    collective_name: Optional[str]
+    orcid: Optional[str]
+    affiliations: Optional[List[str]]
+    emails: Optional[List[str]]
+
+    def to_author(self) -> Author:
+        return Author.construct(**self._asdict())
+
+
+class JournalRecord(NamedTuple):
+    """A lightweight, unvalidated counterpart of Journal, with the same fields"""
+
+    title: Optional[str]
+    issn: Optional[List[str]]
+    volume: Optional[str]
+    issue: Optional[str]
+    pub_year: Optional[str]
+    pub_month: Optional[str]
+    pub_day: Optional[str]
+    iso_abbreviation: Optional[str]
+
+    def to_journal(self) -> Journal:
+        return Journal.construct(**self._asdict())
+
+
+class CitationRecord(NamedTuple):
+    """
+    A lightweight, unvalidated counterpart of Citation, with the same fields, for bulk ingestion
+
+    Records are tuples without a per-instance dict. Parsers emitting them intern the strings
+    repeated across articles: journal titles and abbreviations, ISSNs and publication types.
+
+    Methods
+    ----------
+    to_citation() -> Citation
+        Validate as a Citation
+    from_citation(citation: Citation) -> CitationRecord
+        Copy the fields of a Citation
+    """
+
+    pmid: Optional[str]
+    pmc: Optional[str]
+    doi: Optional[str]
+    title: str
+    abstract: Optional[str]
+    author_list: Optional[List[AuthorRecord]]
+    journal: JournalRecord
+    publication_type_list: List[str]
+    correspondence: List[Dict[str, Any]]
+    mesh_list: Optional[List[Dict[str, Any]]] = None
+    version: Optional[str] = None
+
+    def to_citation(self) -> Citation:
+        fields = self._asdict()
+        if self.author_list is not None:
+            fields['author_list'] = [author.to_author() for author in self.author_list]
+        fields['journal'] = self.journal.to_journal()
+        return Citation(**fields)
+
+    @classmethod
+    def from_citation(cls, citation: Citation) -> 'CitationRecord':
+        fields = dict(citation)
+        if citation.author_list is not None:
+            fields['author_list'] = [AuthorRecord(**dict(author)) for author in citation.author_list]
+        fields['journal'] = JournalRecord(**dict(citation.journal))
+        return cls(**fields)
+
+
+class Summary(BaseModel):
+    """
+    A light representation of an ESUMMARY document summary (DocSum)
+
+    Attributes
+    ----------
+    uid : str
+        Unique id in the database summarized
+    title : Optional[str]
+        Article title
+    authors : List[str]
+        Author names, e.g. Liu X
+    source : Optional[str]
+        Journal title ISO Abbreviation
+    full_journal_name : Optional[str]
+        Journal name
+    issn : Optional[str]
+        International Standard Serial Number
+    volume : Optional[str]
+        Journal volume
+    issue : Optional[str]
+        Journal issue
+    pages : Optional[str]
+        Pages, or an electronic location
+    pub_date : Optional[str]
+        Date of publication, e.g. 2022 Feb 22
+    pub_types : List[str]
+        Publication type names, e.g. Journal Article
+    doi : Optional[str]
+        Digital Object Identifier
+    pmid : Optional[str]
+        PubMed id
+    pmc : Optional[str]
+        PubMedCentral id
+    """
+
+    uid: str
+    title: Optional[str]
+    authors: List[str] = []
+    source: Optional[str]
+    full_journal_name: Optional[str]
+    issn: Optional[str]
+    volume: Optional[str]
+    issue: Optional[str]
+    pages: Optional[str]
+    pub_date: Optional[str]
+    pub_types: List[str] = []
+    doi: Optional[str]
+    pmid: Optional[str]
+    pmc: Optional[str]
+
+
+class DeletedCitation(BaseModel):
+    """
+    A PubMed record deleted by an update file
+
+    Attributes
+    ----------
+    pmid : str
+        PubMed unique id (uid)
+    version : Optional[str]
+        Version of the record deleted
+    """
+
+    pmid: str
+    version: Optional[str]
+
+
+AnyCitation: TypeAlias = Union[Citation, CitationRecord]
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    """The canonical copy of a string repeated across records"""
+    return sys.intern(value) if value is not None else None
+
+
+#############################
+#   Projection
+#############################
+
+citation_fields = frozenset(Citation.__fields__)
+
+
+def _check_fields(fields: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    """Validate a projection onto Citation fields"""
+    if fields is not None and not fields <= citation_fields:
+        raise ValueError(f'Unknown Citation fields: {", ".join(sorted(fields - citation_fields))}')
+    return fields
+
+
+def _unselected(fields: Optional[FrozenSet[str]], compact: bool = False) -> Dict[str, Any]:
+    """Values of the Citation fields left out of a projection onto fields: empty, or None where optional
+
+    The pmid is always kept, as the key of a record.
+    """
+    if fields is None:
+        return {}
+    empty: Dict[str, Any] = {
+        'title': '',
+        'journal': JournalRecord._make([None] * len(JournalRecord._fields)) if compact else Journal(),
+        'publication_type_list': [],
+        'correspondence': [],
+    }
+    return {field: empty.get(field) for field in citation_fields - fields - {'pmid'}}
+
+
+def _project(citation: AnyCitation, fields: Optional[FrozenSet[str]]) -> AnyCitation:
+    """A citation with the fields left out of a projection onto fields emptied"""
+    if fields is None:
+        return citation
+    if isinstance(citation, CitationRecord):
+        return citation._replace(**_unselected(fields, compact=True))
+    return citation.copy(update=_unselected(fields))
@@ -1,14 +1,41 @@
 from pydantic import BaseModel
-from typing import Optional, List, Generator, Dict, Any
+from pydantic import validator
+from typing import Optional, List, Generator, Dict, Any, Union, FrozenSet, Tuple, Deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from collections import deque
+from multiprocessing.context import BaseContext
+import multiprocessing
+import os
 import re
+import sys
 from typing_extensions import TypeAlias
-from ncbiutils.pubmed import Author, Journal, Citation
+from ncbiutils.pubmed import (
+    Author,
+    Journal,
+    Citation,
+    AuthorRecord,
+    JournalRecord,
+    CitationRecord,
+    DeletedCitation,
+    AnyCitation,
+    _intern,
+    _check_fields,
+    _unselected,
+)
+from ncbiutils.metrics import Metrics, _call
 from ncbiutils.xml import (
     Element,
     XmlTree,
-    _find_safe,
-    _text_safe,
+    XmlSource,
+    Children,
     _find_all,
+    _iterparse,
+    _root_tag,
+    _split_elements,
+    _from_raw,
+    _index_children,
+    _first,
+    _first_text,
     _collect_element_text_with_prefix,
     _collect_element_text,
 )
@@ -20,73 +47,132 @@ from ncbiutils.xml import (
 PubmedArticle: TypeAlias = Element
 PubmedArticleSet: TypeAlias = Element
 
+email_regex = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
+
 
 class PubmedXmlParser(BaseModel):
     """
     Capabilities to parse PubMed XML.
     See DTD http://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_190101.dtd
 
+    Each PubmedArticle is walked once, level by level, with fields read from the
+    indexed children of MedlineCitation, Article, PubmedData, Journal and each Author.
+
+    Attributes
+    ----------
+    compact : bool
+        Emit lightweight CitationRecords rather than Citations (default False)
+    fields : Optional[FrozenSet[str]]
+        Citation fields to extract, leaving the others empty, e.g. {'pmid', 'title', 'abstract'} (default all)
+    metrics : Optional[Metrics]
+        Record the time spent extracting each field, as 'seconds:field:<field>', and the articles parsed (default None)
+
     Methods
     ----------
     parse(data: bytes) -> Generator[Citation, None, None]
         Return a list of article data given PubMed XML bytes
+    iterparse(source: XmlSource) -> Generator[Citation, None, None]
+        Incrementally parse a PubMed XML stream, yielding article data as each article closes
+    parse_parallel(data: bytes, max_workers: Optional[int], size: int, mp_context: Optional[BaseContext])
+            -> Generator[Citation, None, None]
+        Parse PubMed XML bytes in a process pool, split into runs of size articles
+    parse_updates(xml_tree: XmlTree) -> Generator[Union[Citation, DeletedCitation], None, None]
+        Parse PubMed XML to article data and the records deleted, in document order
 
     """
 
-    def _get_pmid(self, pubmed_article: PubmedArticle) -> Optional[str]:
-        pmid = _text_safe(pubmed_article, './/MedlineCitation/PMID')
+    compact: bool = False
+    fields: Optional[FrozenSet[str]] = None
+
+    metrics: Optional[Metrics] = None
+
+    fields_are_known = validator('fields', allow_reuse=True)(_check_fields)
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _selects(self, field: str) -> bool:
+        return self.fields is None or field in self.fields
+
+    def _get_pmid(self, medline_citation: Children) -> Optional[str]:
+        pmid = _first_text(medline_citation, 'PMID')
         return pmid
 
-    def _get_doi(self, pubmed_article: PubmedArticle) -> Optional[str]:
-        doi = _text_safe(pubmed_article, './/PubmedData/ArticleIdList/ArticleId[@IdType="doi"]')
+    def _get_version(self, medline_citation: Children) -> Optional[str]:
+        pmid = _first(medline_citation, 'PMID')
+        return pmid.get('Version') if pmid is not None else None
+
+    def _get_article_ids(self, pubmed_data: Children) -> Dict[str, Optional[str]]:
+        article_ids: Dict[str, Optional[str]] = {}
+        for article_id_list in pubmed_data.get('ArticleIdList', []):
+            for article_id in article_id_list.iterchildren('ArticleId'):
+                article_ids.setdefault(article_id.get('IdType'), article_id.text)
+        return article_ids
+
+    def _get_doi(self, article_ids: Dict[str, Optional[str]]) -> Optional[str]:
+        doi = article_ids.get('doi')
         return doi
 
-    def _get_pmc(self, pubmed_article: PubmedArticle) -> Optional[str]:
-        pmc = _text_safe(pubmed_article, './/PubmedData/ArticleIdList/ArticleId[@IdType="pmc"]')
+    def _get_pmc(self, article_ids: Dict[str, Optional[str]]) -> Optional[str]:
+        pmc = article_ids.get('pmc')
         return pmc
 
-    def _get_abstract(self, pubmed_article: PubmedArticle) -> Optional[str]:
+    def _get_abstract(self, article: Children) -> Optional[str]:
         abstract = []
-        AbstractTexts = _find_all(pubmed_article, './/MedlineCitation/Article/Abstract/AbstractText')
-        for AbstractText in AbstractTexts:
-            abstract.append(_collect_element_text_with_prefix(AbstractText, 'Label'))
+        for Abstract in article.get('Abstract', []):
+            for AbstractText in Abstract.iterchildren('AbstractText'):
+                abstract.append(_collect_element_text_with_prefix(AbstractText, 'Label'))
         return ' '.join(abstract) if len(abstract) > 0 else None
 
-    def _get_title(self, pubmed_article: PubmedArticle) -> str:
-        title = pubmed_article.find('.//MedlineCitation/Article/ArticleTitle')
+    def _get_title(self, article: Children) -> str:
+        title = _first(article, 'ArticleTitle')
         text = _collect_element_text(title)
         return text
 
-    def _get_affiliations(self, author: Element) -> Optional[List[str]]:
-        affiliations = _find_all(author, './/AffiliationInfo/Affiliation')
-        alist = [_collect_element_text(affiliation) for affiliation in affiliations]
+    def _get_affiliations(self, author: Children) -> Optional[List[str]]:
+        alist = [
+            _collect_element_text(affiliation)
+            for affiliation_info in author.get('AffiliationInfo', [])
+            for affiliation in affiliation_info.iterchildren('Affiliation')
+        ]
         return alist if len(alist) > 0 else None
 
-    def _get_emails(self, author: Element) -> Optional[List[str]]:
+    def _get_emails(self, affiliations: Optional[List[str]]) -> Optional[List[str]]:
         emails: List[str] = []
-        email_regex = re.compile(r'[\w.+-]+@[\w-]+\.[\w.-]+')
-        affiliations = _find_all(author, './/AffiliationInfo/Affiliation')
-        for affiliation in affiliations:
-            line = _collect_element_text(affiliation)
+        for line in affiliations or []:
+            if '@' not in line:
+                continue
             sanitized = line.strip('.')
-            matches = re.findall(email_regex, sanitized)
+            matches = email_regex.findall(sanitized)
             emails = emails + matches
         return emails if len(emails) > 0 else None
 
-    def _get_author(self, author: Element) -> Author:
-        return Author(
-            fore_name=_text_safe(author, './/ForeName'),
-            last_name=_text_safe(author, './/LastName'),
-            initials=_text_safe(author, './/Initials'),
-            collective_name=_text_safe(author, './/CollectiveName'),
-            orcid=_text_safe(author, './/Identifier[@Source="ORCID"]'),
-            affiliations=self._get_affiliations(author),
-            emails=self._get_emails(author),
+    def _get_orcid(self, author: Element) -> Optional[str]:
+        for identifier in author.iter('Identifier'):
+            if identifier.get('Source') == 'ORCID':
+                return identifier.text
+        return None
+
+    def _get_author(self, author: Element) -> Union[Author, AuthorRecord]:
+        children = _index_children(author)
+        affiliations = self._get_affiliations(children)
+        make_author = AuthorRecord if self.compact else Author.construct
+        return make_author(
+            fore_name=_first_text(children, 'ForeName'),
+            last_name=_first_text(children, 'LastName'),
+            initials=_first_text(children, 'Initials'),
+            collective_name=_first_text(children, 'CollectiveName'),
+            orcid=self._get_orcid(author),
+            affiliations=affiliations,
+            emails=self._get_emails(affiliations),
         )
 
-    def _get_author_list(self, pubmed_article: PubmedArticle) -> Optional[List[Author]]:
-        authors = _find_all(pubmed_article, './/MedlineCitation/Article/AuthorList/Author')
-        author_list = [self._get_author(author) for author in authors]
+    def _get_author_list(self, article: Children) -> Optional[List[Any]]:
+        author_list = [
+            self._get_author(author)
+            for author_list_elt in article.get('AuthorList', [])
+            for author in author_list_elt.iterchildren('Author')
+        ]
         return author_list if len(author_list) > 0 else None
 
     def _get_PubmedArticleSet(self, xml_tree: XmlTree) -> PubmedArticleSet:
@@ -95,31 +181,42 @@ class PubmedXmlParser(BaseModel):
             raise ValueError('XML document does not contain a PubmedArticleSet')
         return pubmed_article_set
 
-    def _get_journal(self, pubmed_article: PubmedArticle) -> Journal:
-        journal = _find_safe(pubmed_article, './/MedlineCitation/Article/Journal')
-        issn = [_collect_element_text(issn) for issn in _find_all(journal, './/ISSN')]
-        title = _text_safe(journal, './/Title')
-        iso_abbreviation = _text_safe(journal, './/ISOAbbreviation')
-        volume = _text_safe(journal, './/JournalIssue/Volume')
-        issue = _text_safe(journal, './/JournalIssue/Issue')
-        pub_year = _text_safe(journal, './/JournalIssue/PubDate/Year')
-        pub_month = _text_safe(journal, './/JournalIssue/PubDate/Month')
-        pub_day = _text_safe(journal, './/JournalIssue/PubDate/Day')
-        return Journal(
+    def _get_journal(self, article: Children) -> Union[Journal, JournalRecord]:
+        journal = _index_children(_first(article, 'Journal'))
+        journal_issue = _index_children(_first(journal, 'JournalIssue'))
+        pub_date = _index_children(_first(journal_issue, 'PubDate'))
+        issn = [_collect_element_text(issn) for issn in journal.get('ISSN', [])]
+        title = _first_text(journal, 'Title')
+        iso_abbreviation = _first_text(journal, 'ISOAbbreviation')
+        if self.compact:
+            return JournalRecord(
+                issn=[sys.intern(value) for value in issn],
+                title=_intern(title),
+                iso_abbreviation=_intern(iso_abbreviation),
+                volume=_first_text(journal_issue, 'Volume'),
+                issue=_first_text(journal_issue, 'Issue'),
+                pub_year=_first_text(pub_date, 'Year'),
+                pub_month=_first_text(pub_date, 'Month'),
+                pub_day=_first_text(pub_date, 'Day'),
+            )
+        return Journal.construct(
             issn=issn,
             title=title,
             iso_abbreviation=iso_abbreviation,
-            volume=volume,
-            issue=issue,
-            pub_year=pub_year,
-            pub_month=pub_month,
-            pub_day=pub_day,
+            volume=_first_text(journal_issue, 'Volume'),
+            issue=_first_text(journal_issue, 'Issue'),
+            pub_year=_first_text(pub_date, 'Year'),
+            pub_month=_first_text(pub_date, 'Month'),
+            pub_day=_first_text(pub_date, 'Day'),
         )
 
-    def _get_pubtypes(self, pubmed_article: PubmedArticle) -> List[str]:
-        publication_types = _find_all(pubmed_article, './/MedlineCitation/Article/PublicationTypeList/PublicationType')
-        uids = [element.get('UI') for element in publication_types]
-        return uids
+    def _get_pubtypes(self, article: Children) -> List[str]:
+        uids = [
+            publication_type.get('UI')
+            for publication_type_list in article.get('PublicationTypeList', [])
+            for publication_type in publication_type_list.iterchildren('PublicationType')
+        ]
+        return [sys.intern(uid) for uid in uids] if self.compact else uids
 
     def _get_ui(self, element: Element) -> Dict[str, str]:
         ui = element.get('UI')
@@ -128,43 +225,127 @@ class PubmedXmlParser(BaseModel):
 
     def _get_mesh_heading(self, mesh_heading: Element) -> Dict[str, Any]:
         heading: Dict[str, Any] = {}
-        descriptor_name = _find_safe(mesh_heading, './/DescriptorName')
-        heading['descriptor_name'] = self._get_ui(descriptor_name)
-        qualifier_name_list = _find_all(mesh_heading, './/QualifierName')
+        children = _index_children(mesh_heading)
+        heading['descriptor_name'] = self._get_ui(_first(children, 'DescriptorName'))
+        qualifier_name_list = children.get('QualifierName', [])
         if len(qualifier_name_list) > 0:
             heading['qualifier_name'] = [self._get_ui(qualifier_name) for qualifier_name in qualifier_name_list]
         return heading
 
-    def _get_mesh_list(self, pubmed_article: PubmedArticle) -> Optional[List[Dict[str, Any]]]:
-        mesh_heading_list = _find_all(pubmed_article, './/MedlineCitation/MeshHeadingList/MeshHeading')
-        mesh_list = [self._get_mesh_heading(mesh_heading) for mesh_heading in mesh_heading_list]
+    def _get_mesh_list(self, medline_citation: Children) -> Optional[List[Dict[str, Any]]]:
+        mesh_list = [
+            self._get_mesh_heading(mesh_heading)
+            for mesh_heading_list in medline_citation.get('MeshHeadingList', [])
+            for mesh_heading in mesh_heading_list.iterchildren('MeshHeading')
+        ]
         return mesh_list if len(mesh_list) > 0 else None
 
-    def parse(self, xml_tree: XmlTree) -> Generator[Citation, None, None]:
+    def _get_citation(self, pubmed_article: PubmedArticle) -> AnyCitation:
+        selects = self._selects
+        call = _call if self.metrics is None else self.metrics.call
+        children = _index_children(pubmed_article)
+        medline_citation = _index_children(_first(children, 'MedlineCitation'))
+        citation = _unselected(self.fields, self.compact)
+        citation['pmid'] = call('field:pmid', self._get_pmid, medline_citation)
+        if selects('pmc') or selects('doi'):
+            article_ids = self._get_article_ids(_index_children(_first(children, 'PubmedData')))
+            if selects('pmc'):
+                citation['pmc'] = call('field:pmc', self._get_pmc, article_ids)
+            if selects('doi'):
+                citation['doi'] = call('field:doi', self._get_doi, article_ids)
+        article = _index_children(_first(medline_citation, 'Article'))
+        if selects('title'):
+            citation['title'] = call('field:title', self._get_title, article)
+        if selects('abstract'):
+            citation['abstract'] = call('field:abstract', self._get_abstract, article)
+        if selects('author_list'):
+            citation['author_list'] = call('field:author_list', self._get_author_list, article)
+        if selects('journal'):
+            citation['journal'] = call('field:journal', self._get_journal, article)
+        if selects('publication_type_list'):
+            citation['publication_type_list'] = call('field:publication_type_list', self._get_pubtypes, article)
+        if selects('correspondence'):
+            citation['correspondence'] = []
+        if selects('mesh_list'):
+            citation['mesh_list'] = call('field:mesh_list', self._get_mesh_list, medline_citation)
+        if selects('version'):
+            citation['version'] = call('field:version', self._get_version, medline_citation)
+        make_citation = CitationRecord if self.compact else Citation
+        if self.metrics is not None:
+            self.metrics.count('articles')
+        return make_citation(**citation)
+
+    def parse(self, xml_tree: XmlTree) -> Generator[AnyCitation, None, None]:
         """Parse an XML document to a list of custom citations"""
         pubmed_article_set = self._get_PubmedArticleSet(xml_tree)
         pubmed_articles = _find_all(pubmed_article_set, './/PubmedArticle')
 
         for pubmed_article in pubmed_articles:
-            pmid = self._get_pmid(pubmed_article)
-            pmc = self._get_pmc(pubmed_article)
-            doi = self._get_doi(pubmed_article)
-            title = self._get_title(pubmed_article)
-            abstract = self._get_abstract(pubmed_article)
-            author_list = self._get_author_list(pubmed_article)
-            journal = self._get_journal(pubmed_article)
-            publication_type_list = self._get_pubtypes(pubmed_article)
-            mesh_list = self._get_mesh_list(pubmed_article)
-            citation = Citation(
-                pmid=pmid,
-                pmc=pmc,
-                title=title,
-                doi=doi,
-                abstract=abstract,
-                author_list=author_list,
-                journal=journal,
-                publication_type_list=publication_type_list,
-                correspondence=[],
-                mesh_list=mesh_list,
-            )
-            yield citation
+            yield self._get_citation(pubmed_article)
+
+    def _get_deleted_citations(self, delete_citation: Element) -> List[DeletedCitation]:
+        return [
+            DeletedCitation(pmid=pmid.text, version=pmid.get('Version'))
+            for pmid in delete_citation.iterchildren('PMID')
+        ]
+
+    def parse_updates(self, xml_tree: XmlTree) -> Generator[Union[AnyCitation, DeletedCitation], None, None]:
+        """Parse an XML document to custom citations and a DeletedCitation for each PMID of DeleteCitation"""
+        pubmed_article_set = self._get_PubmedArticleSet(xml_tree)
+        for element in pubmed_article_set.iterchildren('PubmedArticle', 'DeleteCitation'):
+            if element.tag == 'PubmedArticle':
+                yield self._get_citation(element)
+            else:
+                yield from self._get_deleted_citations(element)
+
+    def iterparse(self, source: XmlSource) -> Generator[AnyCitation, None, None]:
+        """Parse an XML stream to custom citations, discarding each PubmedArticle once processed"""
+        for pubmed_article in _iterparse(source, 'PubmedArticle', 'PubmedArticleSet'):
+            yield self._get_citation(pubmed_article)
+
+    def _parse_fragment(self, fragment: bytes) -> Tuple[List[CitationRecord], Dict[str, float]]:
+        """Parse in a worker process to CitationRecords, cheaper to send back than Citations,
+        returning the counters recorded by its copy of metrics
+        """
+        xml_tree = _from_raw(b'<PubmedArticleSet>' + fragment + b'</PubmedArticleSet>')
+        records = list(self.copy(update={'compact': True}).parse(xml_tree))
+        return records, self.metrics.counters if self.metrics is not None else {}
+
+    def parse_parallel(
+        self,
+        data: bytes,
+        max_workers: Optional[int] = None,
+        size: int = 1000,
+        mp_context: Optional[BaseContext] = None,
+    ) -> Generator[AnyCitation, None, None]:
+        """Parse XML bytes to custom citations in a process pool, merged in document order
+
+        The document is split into byte ranges at PubmedArticle boundaries, each of up to size articles,
+        with at most two per worker submitted at a time. Worker processes are spawned unless another
+        mp_context is given.
+        """
+        if _root_tag(data) != 'PubmedArticleSet':
+            raise ValueError('XML document does not contain a PubmedArticleSet')
+        fragments = (data[start:end] for start, end in _split_elements(data, 'PubmedArticle', size))
+        max_workers = max_workers or os.cpu_count() or 1
+        pending: Deque[Future] = deque()
+        with ProcessPoolExecutor(
+            max_workers, mp_context=mp_context or multiprocessing.get_context('spawn')
+        ) as executor:
+            for fragment in fragments:
+                pending.append(executor.submit(self._parse_fragment, fragment))
+                if len(pending) >= 2 * max_workers:
+                    yield from self._merge(pending.popleft())
+            while pending:
+                yield from self._merge(pending.popleft())
+
+    def _merge(self, future: Future) -> Generator[AnyCitation, None, None]:
+        """Yield the citations of a parsed fragment, recording its counters"""
+        records, counters = future.result()
+        if self.metrics is not None:
+            self.metrics.update(counters)
+        if self.compact:
+            yield from records
+        else:
+            for record in records:
+                yield record.to_citation()
@@ -0,0 +1,217 @@
+from pydantic import BaseModel
+from typing import Optional, List, Dict, NamedTuple, Generator, Any
+from threading import Lock
+from loguru import logger
+from ncbiutils.types import DownloadPathEnum
+from ncbiutils.ncbiutils import Chunk, PubMedDownload
+import hashlib
+import re
+import sqlite3
+import time
+
+md5_regex = re.compile(r'\b([0-9a-fA-F]{32})\b')
+
+
+class LedgerEntry(NamedTuple):
+    """The state of a download file in a SyncLedger"""
+
+    download_path: str
+    file: str
+    size: Optional[int]
+    md5: Optional[str]
+    etag: Optional[str]
+    last_modified: Optional[str]
+    chunks: int
+    complete: bool
+
+
+class SyncLedger:
+    """
+    A persistent SQLite record of the PubMed download files processed by PubMedSync
+
+    Attributes
+    ----------
+    path : str
+        Location of the SQLite database file, or ':memory:'
+
+    Methods
+    ----------
+    get(download_path: str, file: str) -> Optional[LedgerEntry]
+        Return the entry for a file, if any
+    start(entry: LedgerEntry)
+        Record a file as in progress, replacing any previous entry
+    advance(download_path: str, file: str, chunks: int)
+        Record the number of Chunks of a file delivered so far
+    complete(download_path: str, file: str)
+        Record a file as completely processed
+    entries(download_path: str) -> List[LedgerEntry]
+        Return the entries under a download path
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                'download_path TEXT NOT NULL, file TEXT NOT NULL, size INTEGER, md5 TEXT, etag TEXT, '
+                'last_modified TEXT, chunks INTEGER NOT NULL, complete INTEGER NOT NULL, updated REAL NOT NULL, '
+                'PRIMARY KEY (download_path, file))'
+            )
+
+    def get(self, download_path: str, file: str) -> Optional[LedgerEntry]:
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT download_path, file, size, md5, etag, last_modified, chunks, complete FROM files '
+                'WHERE download_path = ? AND file = ?',
+                [download_path, file],
+            ).fetchone()
+        return LedgerEntry._make((*row[:-1], bool(row[-1]))) if row else None
+
+    def start(self, entry: LedgerEntry) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', [*entry, time.time()]
+            )
+
+    def advance(self, download_path: str, file: str, chunks: int) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE files SET chunks = ?, updated = ? WHERE download_path = ? AND file = ?',
+                [chunks, time.time(), download_path, file],
+            )
+
+    def complete(self, download_path: str, file: str) -> None:
+        with self._lock, self._connection:
+            self._connection.execute(
+                'UPDATE files SET complete = 1, updated = ? WHERE download_path = ? AND file = ?',
+                [time.time(), download_path, file],
+            )
+
+    def entries(self, download_path: str) -> List[LedgerEntry]:
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT download_path, file, size, md5, etag, last_modified, chunks, complete FROM files '
+                'WHERE download_path = ? ORDER BY file',
+                [download_path],
+            ).fetchall()
+        return [LedgerEntry._make((*row[:-1], bool(row[-1]))) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class PubMedSync(BaseModel):
+    """
+    Retrieve the Citations of only those PubMed download files that are new or changed since the last sync
+
+    A file is unchanged when its .md5 sidecar matches the ledger or, failing that, the server answers
+    a conditional request with 304 Not Modified. A file is recorded as complete once the consumer asks
+    for the Chunk after its last, so a sync interrupted mid-file resumes after the Chunks already delivered,
+    provided the file received is the version recorded; otherwise it starts over.
+
+    Attributes
+    ----------
+    ledger : SyncLedger
+        Record of the files processed
+    download : PubMedDownload
+        Retrieves and parses the files; its retmax sets the size of each Chunk
+
+    Methods
+    ----------
+    sync(files: Optional[List[str]] = None,
+      download_path: DownloadPathEnum = DownloadPathEnum.updatefiles) -> Generator[Chunk, None, None]
+        Yields Chunks for the files not completely processed or changed since, in order (default all listed)
+    """
+
+    ledger: SyncLedger
+    download: PubMedDownload = PubMedDownload()
+
+    class Config:
+        arbitrary_types_allowed = True
+
+    def _get_md5(self, url: str) -> Optional[str]:
+        """Checksum published alongside a file, or None if unavailable"""
+        error, response = self.download._request(f'{url}.md5')
+        if error or not response:
+            return None
+        match = md5_regex.search(response.text)
+        return match.group(1).lower() if match else None
+
+    def _conditional_headers(self, entry: LedgerEntry) -> Dict[str, str]:
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def _is_same_version(self, entry: LedgerEntry, digest: str, response: Any) -> bool:
+        """Whether a file received has the checksum and any ETag and Last-Modified of the version recorded"""
+        return (
+            digest == entry.md5
+            and (entry.etag is None or entry.etag == response.headers.get('ETag'))
+            and (entry.last_modified is None or entry.last_modified == response.headers.get('Last-Modified'))
+        )
+
+    def _sync_file(self, file: str, download_path: str) -> Generator[Chunk, None, None]:
+        url = f'{self.download.base_url}{download_path}/{file}'
+        entry = self.ledger.get(download_path, file)
+        md5 = self._get_md5(url)
+        is_changed = entry is None or (md5 is not None and md5 != entry.md5)
+        if entry is not None and entry.complete and not is_changed and md5 is not None:
+            return
+        headers = self._conditional_headers(entry) if entry is not None and entry.complete and not is_changed else {}
+        skip = entry.chunks if entry is not None and not entry.complete and not is_changed else 0
+
+        error, response = self.download._request(url, headers=headers)
+        if error or not response:
+            yield Chunk(error, None, [file])
+            return
+        if response.status_code == 304:
+            response.close()
+            return
+        try:
+            data = response.content
+            digest = hashlib.md5(data).hexdigest()
+            if md5 is not None and digest != md5:
+                raise ValueError(f'MD5 mismatch for {file}: expected {md5}, received {digest}')
+            citations = self.download._parse_response(data)
+        except Exception as e:
+            logger.error(f'Error encountered in sync of {file}: {e}')
+            yield Chunk(e, None, [file])
+            return
+        if skip and entry is not None and not self._is_same_version(entry, digest, response):
+            logger.warning(f'{file} changed since it was partly synced; starting over')
+            skip = 0
+
+        self.ledger.start(
+            LedgerEntry(
+                download_path,
+                file,
+                len(data),
+                digest,
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified'),
+                skip,
+                False,
+            )
+        )
+        retmax = self.download.retmax
+        chunks = [citations[i : i + retmax] for i in range(0, len(citations), retmax)] or [[]]
+        for i in range(skip, len(chunks)):
+            yield Chunk(None, chunks[i], [file])
+            self.ledger.advance(download_path, file, i + 1)
+        self.ledger.complete(download_path, file)
+
+    def sync(
+        self, files: Optional[List[str]] = None, download_path: DownloadPathEnum = DownloadPathEnum.updatefiles
+    ) -> Generator[Chunk, None, None]:
+        """Yields Chunk error, citations and the file name for each new or changed file, recording progress"""
+        path = DownloadPathEnum(download_path).value
+        if files is None:
+            files = [file.name for file in self.download.list_files(download_path)]
+        for file in files:
+            yield from self._sync_file(file, path)
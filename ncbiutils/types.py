@@ -22,6 +22,7 @@ class RetModeEnum(str, Enum):
     text = 'text'
     xml = 'xml'
     asn = 'asn.1'
+    json = 'json'
 
 
 class RetTypeEnum(str, Enum):
@@ -31,6 +32,17 @@ class RetTypeEnum(str, Enum):
     medline = 'medline'
 
 
+class LinkCmdEnum(str, Enum):
+    neighbor = 'neighbor'
+    neighbor_score = 'neighbor_score'
+
+
+class IdStatusEnum(str, Enum):
+    found = 'found'
+    missing = 'missing'
+    errored = 'errored'
+
+
 class DownloadPathEnum(str, Enum):
     updatefiles = 'updatefiles'
     baseline = 'baseline'
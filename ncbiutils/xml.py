@@ -1,4 +1,5 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Generator, BinaryIO, Union, Tuple
+from io import BufferedIOBase, BytesIO
 from lxml import etree
 from typing_extensions import TypeAlias
 
@@ -8,6 +9,10 @@ from typing_extensions import TypeAlias
 
 XmlTree: TypeAlias = etree._ElementTree
 Element: TypeAlias = etree._Element
+XmlSource: TypeAlias = Union[BinaryIO, BufferedIOBase]
+Children: TypeAlias = Dict[str, List[Element]]
+
+_string_value = etree.XPath('string()')
 
 ##################################
 #   XML package-specific
@@ -25,6 +30,72 @@ def _from_raw(data: bytes) -> XmlTree:
     return element_tree
 
 
+def _iterparse_records(
+    source: XmlSource, records: Dict[str, str], skip: Tuple[str, ...] = ()
+) -> Generator[Tuple[str, Element], None, None]:
+    """Incrementally parse a file-like source, yielding (root tag, element) for each record element once it is closed
+
+    records maps each accepted root tag to the tag of its record elements. The root is identified
+    from the first start event, raising ValueError when it is not one of records. Each yielded element
+    is cleared, along with its preceding siblings, when the consumer moves on, and elements with a
+    skip tag are cleared as soon as they close, so memory does not grow with the size of the document.
+    """
+    root_tag = ''
+    tags = {*records, *records.values(), *skip}
+    for event, element in etree.iterparse(source, events=('start', 'end'), tag=tags):
+        if event == 'start':
+            if not root_tag:
+                if element.getparent() is not None or element.tag not in records:
+                    break
+                root_tag = element.tag
+            continue
+        if element.tag in skip:
+            element.clear(keep_tail=True)
+            continue
+        if element.tag != records[root_tag]:
+            continue
+        yield root_tag, element
+        element.clear()
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+    if not root_tag:
+        raise ValueError(f'XML document does not contain a {" or ".join(records)}')
+
+
+def _iterparse(
+    source: XmlSource, tag: str, root_tag: str, skip: Tuple[str, ...] = ()
+) -> Generator[Element, None, None]:
+    """Incrementally parse a file-like source with root root_tag, yielding each tag element once it is closed"""
+    for _, element in _iterparse_records(source, {root_tag: tag}, skip):
+        yield element
+
+
+def _root_tag(data: bytes) -> str:
+    """Tag of the document root, reading no further than its start tag"""
+    for _, element in etree.iterparse(BytesIO(data), events=('start',)):
+        return element.tag
+    return ''
+
+
+def _split_elements(data: bytes, tag: str, size: int) -> List[Tuple[int, int]]:
+    """Byte ranges of data each spanning up to size consecutive tag elements, in document order
+
+    Each range starts at an opening tag and ends after a closing tag, so it is well-formed once
+    wrapped in a root element. The tag must be written without attributes, as PubmedArticle is.
+    """
+    start_tag, end_tag = f'<{tag}>'.encode(), f'</{tag}>'.encode()
+    starts = []
+    position = data.find(start_tag)
+    while position != -1:
+        starts.append(position)
+        position = data.find(start_tag, position + len(start_tag))
+    if not starts:
+        return []
+    range_starts = starts[::size]
+    end = data.rfind(end_tag) + len(end_tag)
+    return list(zip(range_starts, range_starts[1:] + [end]))
+
+
 def _find_all(element: Element, xpath: str) -> List[Element]:
     """Wrapper for finding elements for xpath query, possibly empty"""
     return element.findall(xpath)
@@ -42,12 +113,35 @@ def _text_safe(element: Element, xpath: str) -> Optional[str]:
     return optional.text if optional is not None else None
 
 
+def _index_children(element: Optional[Element]) -> Children:
+    """Group the child elements by tag in a single pass, in document order"""
+    children: Children = {}
+    if element is not None:
+        for child in element:
+            if isinstance(child.tag, str):
+                children.setdefault(child.tag, []).append(child)
+    return children
+
+
+def _first(children: Children, tag: str) -> Optional[Element]:
+    """First indexed child with tag, or None"""
+    elements = children.get(tag)
+    return elements[0] if elements else None
+
+
+def _first_text(children: Children, tag: str) -> Optional[str]:
+    """Text of the first indexed child with tag, or None"""
+    element = _first(children, tag)
+    return element.text if element is not None else None
+
+
 def _collect_element_text(element: Element) -> str:
     """Collect all text from child elements as a single string
 
     Note: This implemenation essentially ignores text and math markup
     """
-    return ' '.join(element.xpath('string()').split())
+    text = _string_value(element) if len(element) else element.text or ''
+    return ' '.join(text.split())
 
 
 def _collect_element_text_with_prefix(element: Element, attribute: str):
@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestServer  # noqa: E402
+from ncbiutils.aio import AsyncPubMedFetch, AsyncPubMedDownload, safe_requests, create_session  # noqa: E402
+from ncbiutils.http import AdaptiveBatcher, RequestsError  # noqa: E402
+from ncbiutils.ncbiutils import PubMedFetch  # noqa: E402
+
+# #############################
+# #   Helpers
+# #############################
+
+
+def collect(agen):
+    async def run():
+        return [item async for item in agen]
+
+    return asyncio.run(run())
+
+
+def mock_safe_requests(mocker, responses):
+    async def fake(session, url, **opts):
+        await asyncio.sleep(0)
+        return responses[url.rsplit('/', 1)[-1]]
+
+    return mocker.patch('ncbiutils.aio.safe_requests', side_effect=fake)
+
+
+# #############################
+# #   Unit tests
+# #############################
+
+
+@pytest.mark.parametrize('status, is_error', [(200, False), (404, True)])
+def test_safe_requests(status, is_error):
+    async def handler(request):
+        return web.Response(status=status, body=b'body')
+
+    async def run():
+        app = web.Application()
+        app.router.add_get('/', handler)
+        async with TestServer(app) as server:
+            async with create_session() as session:
+                return await safe_requests(session, str(server.make_url('/')))
+
+    error, content = asyncio.run(run())
+    assert (error is not None) == is_error
+    if is_error:
+        assert isinstance(error, RequestsError)
+    else:
+        assert content == b'body'
+
+
+class TestAsyncPubMedFetch:
+    @pytest.fixture
+    def pubmed_data(self, shared_datadir):
+        return (shared_datadir / 'pubmed.xml').read_bytes()
+
+    def test_get_citations_matches_sync(self, mocker, pubmed_data):
+        uids = [str(uid) for uid in range(6)]
+        mock_safe_requests(mocker, {'efetch.fcgi': (None, pubmed_data)})
+        pubmed_fetch = AsyncPubMedFetch(retmax=2, max_workers=2, requests_per_second=1000)
+        chunks = collect(pubmed_fetch.get_citations(uids))
+        assert [chunk.ids for chunk in chunks] == [uids[0:2], uids[2:4], uids[4:6]]
+        assert chunks[0].citations == PubMedFetch()._parse_response(pubmed_data)
+
+    def test_get_citations_on_error(self, mocker):
+        mock_safe_requests(mocker, {'efetch.fcgi': (RequestsError(429), None)})
+        chunks = collect(AsyncPubMedFetch(requests_per_second=1000).get_citations(['1', '2']))
+        assert isinstance(chunks[0].error, RequestsError)
+        assert chunks[0].citations is None
+
+    def test_get_citations_on_parse_error(self, mocker):
+        body = b'<eFetchResult><ERROR>Unable to obtain query #1</ERROR></eFetchResult>'
+        mock_safe_requests(mocker, {'efetch.fcgi': (None, body)})
+        pubmed_fetch = AsyncPubMedFetch(retmax=1, max_workers=2, requests_per_second=1000)
+        chunks = collect(pubmed_fetch.get_citations(['1', '2']))
+        assert [chunk.ids for chunk in chunks] == [['1'], ['2']]
+        assert all(isinstance(chunk.error, ValueError) and chunk.citations is None for chunk in chunks)
+
+    @pytest.mark.parametrize('option', [{'stream': True}, {'batcher': AdaptiveBatcher()}])
+    def test_unsupported_options(self, option):
+        with pytest.raises(ValueError):
+            AsyncPubMedFetch(**option)
+
+
+class TestAsyncPubMedDownload:
+    def test_get_citations(self, mocker, shared_datadir):
+        files = ['pubmed22n1115.xml.gz', 'pubmed22n1313.xml.gz', 'missing.xml.gz']
+        responses = {file: (None, (shared_datadir / file).read_bytes()) for file in files[:2]}
+        responses[files[2]] = (RequestsError(404), None)
+        mock_safe_requests(mocker, responses)
+        chunks = collect(AsyncPubMedDownload(max_downloads=2).get_citations(files))
+        assert [chunk.ids[0] for chunk in chunks] == files
+        assert [len(chunk.citations) for chunk in chunks[:2]] == [3, 4]
+        assert isinstance(chunks[2].error, RequestsError)
@@ -0,0 +1,71 @@
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+import pyarrow.parquet as pq  # noqa: E402
+from ncbiutils.arrow import citation_schema, to_record_batch, record_batches, write_parquet  # noqa: E402
+from ncbiutils.ncbiutils import Chunk  # noqa: E402
+from ncbiutils.pmcxmlparser import PmcXmlParser  # noqa: E402
+from ncbiutils.pubmedxmlparser import PubmedXmlParser  # noqa: E402
+from ncbiutils.xml import _from_raw  # noqa: E402
+
+# #############################
+# #   Unit tests
+# #############################
+
+
+@pytest.fixture
+def citations(shared_datadir):
+    data = (shared_datadir / 'pubmed.xml').read_bytes()
+    return list(PubmedXmlParser().parse(_from_raw(data)))
+
+
+def test_to_record_batch(citations):
+    batch = to_record_batch(citations)
+    assert batch.schema == citation_schema
+    rows = batch.to_pylist()
+    for row, citation in zip(rows, citations):
+        assert row['pmid'] == citation.pmid
+        assert row['journal'] == citation.journal.dict()
+        assert row['author_list'] == [author.dict() for author in citation.author_list]
+        assert row['publication_type_list'] == citation.publication_type_list
+
+
+def test_to_record_batch_compact_matches(shared_datadir, citations):
+    data = (shared_datadir / 'pubmed.xml').read_bytes()
+    records = list(PubmedXmlParser(compact=True).parse(_from_raw(data)))
+    assert to_record_batch(records).equals(to_record_batch(citations))
+
+
+def test_to_record_batch_pmc(shared_datadir):
+    data = (shared_datadir / 'pmc_author.xml').read_bytes()
+    citations = list(PmcXmlParser().parse(_from_raw(data)))
+    rows = to_record_batch(citations).to_pylist()
+    assert [row['correspondence'] for row in rows] == [citation.correspondence for citation in citations]
+
+
+def test_record_batches(citations):
+    error = Exception()
+    chunks = [Chunk(None, citations, ['a']), Chunk(error, None, ['b'])]
+    batch_chunks = list(record_batches(chunks))
+    assert batch_chunks[0].batch.num_rows == len(citations)
+    assert batch_chunks[1].error is error
+    assert batch_chunks[1].batch is None
+
+
+def test_write_parquet(tmp_path, citations):
+    base_dir = tmp_path / 'citations'
+    batches = (to_record_batch(citations) for _ in range(3))
+    write_parquet(batches, str(base_dir), max_rows_per_file=10)
+    assert sorted(path.name for path in base_dir.iterdir()) == ['part-0.parquet', 'part-1.parquet']
+    table = pq.read_table(base_dir)
+    assert table.num_rows == 3 * len(citations)
+    assert table.column('pmid').to_pylist()[: len(citations)] == [citation.pmid for citation in citations]
+
+
+def test_write_parquet_replaces_existing_files(tmp_path, citations):
+    base_dir = tmp_path / 'citations'
+    write_parquet((to_record_batch(citations) for _ in range(3)), str(base_dir), max_rows_per_file=2)
+    write_parquet([to_record_batch(citations[:1])], str(base_dir), max_rows_per_file=2)
+    assert [path.name for path in base_dir.iterdir()] == ['part-0.parquet']
+    assert pq.read_table(base_dir).column('pmid').to_pylist() == [citations[0].pmid]
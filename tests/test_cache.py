@@ -0,0 +1,49 @@
+import pytest
+from ncbiutils.cache import CitationCache
+from ncbiutils.pubmedxmlparser import PubmedXmlParser
+from ncbiutils.xml import _from_raw
+
+#############################
+#   Unit tests
+#############################
+
+
+class TestCitationCacheClass(object):
+    @pytest.fixture
+    def citations(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        return list(PubmedXmlParser().parse(_from_raw(data)))
+
+    def test_round_trip(self, tmp_path, citations):
+        path = str(tmp_path / 'cache.sqlite')
+        cache = CitationCache(path)
+        cache.put_many('pubmed', {citation.pmid: citation for citation in citations})
+        cache.close()
+        found = CitationCache(path).get_many('pubmed', [citations[0].pmid, 'missing'])
+        assert found == {citations[0].pmid: citations[0]}
+
+    def test_namespaces_are_distinct(self, citations):
+        cache = CitationCache(':memory:')
+        cache.put_many('pubmed', {'1': citations[0]})
+        assert cache.get_many('pmc', ['1']) == {}
+
+    def test_ttl_expiry(self, mocker, citations):
+        cache = CitationCache(':memory:', ttl=60)
+        clock = mocker.patch('ncbiutils.cache.time.time', return_value=0)
+        cache.put_many('pubmed', {'1': citations[0]})
+        clock.return_value = 61
+        assert cache.get_many('pubmed', ['1']) == {}
+        assert cache.evict() == 1
+
+    def test_max_entries_evicts_least_recently_used(self, mocker, citations):
+        cache = CitationCache(':memory:', max_entries=2)
+        clock = mocker.patch('ncbiutils.cache.time.time', return_value=1)
+        cache.put_many('pubmed', {'1': citations[0]})
+        clock.return_value = 2
+        cache.put_many('pubmed', {'2': citations[1]})
+        clock.return_value = 3
+        cache.get_many('pubmed', ['1'])
+        clock.return_value = 4
+        cache.put_many('pubmed', {'3': citations[2]})
+        assert len(cache) == 2
+        assert set(cache.get_many('pubmed', ['1', '2', '3'])) == {'1', '3'}
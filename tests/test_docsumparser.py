@@ -0,0 +1,48 @@
+import pytest
+from ncbiutils.docsumparser import DocSumParser
+from ncbiutils.pubmed import Summary
+from ncbiutils.xml import _from_raw
+
+#############################
+#   Unit tests
+#############################
+
+
+class TestDocSumParserClass(object):
+    parser = DocSumParser()
+
+    @pytest.fixture
+    def json_summaries(self, shared_datadir):
+        return list(self.parser.parse_json((shared_datadir / 'esummary.json').read_bytes()))
+
+    @pytest.fixture
+    def xml_summaries(self, shared_datadir):
+        return list(self.parser.parse(_from_raw((shared_datadir / 'esummary.xml').read_bytes())))
+
+    def test_parse_json(self, json_summaries):
+        assert [summary.uid for summary in json_summaries] == ['35196497', '33278872']
+        summary = json_summaries[0]
+        assert isinstance(summary, Summary)
+        assert summary.title.startswith('SENP2 suppresses browning')
+        assert summary.authors == ['Liu X', 'Cheng J']
+        assert summary.source == 'Cell Rep'
+        assert summary.full_journal_name == 'Cell reports'
+        assert summary.issn == '2211-1247'
+        assert summary.pub_date == '2022 Feb 22'
+        assert summary.pub_types == ['Journal Article', "Research Support, Non-U.S. Gov't"]
+        assert summary.doi == '10.1016/j.celrep.2022.110408'
+        assert summary.pmid == '35196497'
+        assert summary.pmc is None
+        assert json_summaries[1].pmc == 'PMC7719180'
+
+    def test_parse_xml_matches_json(self, json_summaries, xml_summaries):
+        assert xml_summaries == json_summaries
+
+    def test_parse_json_error(self):
+        with pytest.raises(ValueError):
+            list(self.parser.parse_json(b'{"error": "Invalid db name specified: pubme"}'))
+
+    def test_parse_no_esummaryresult(self, shared_datadir):
+        data = (shared_datadir / 'no_pubmedarticleset.xml').read_bytes()
+        with pytest.raises(ValueError):
+            list(self.parser.parse(_from_raw(data)))
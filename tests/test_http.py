@@ -1,8 +1,11 @@
+import time
 import pytest
 
 import responses
 from requests import ConnectionError, HTTPError, Timeout
-from ncbiutils.http import safe_requests, RequestsError
+from requests.exceptions import ChunkedEncodingError
+from concurrent.futures import ThreadPoolExecutor
+from ncbiutils.http import safe_requests, RequestsError, RateLimiter, SessionPool, RetryPolicy, AdaptiveBatcher
 
 TEST_URL = 'https://fakedomain.org/'
 
@@ -31,3 +34,155 @@ def test_error_on_exception(body):
     error, _ = safe_requests(TEST_URL)
     assert error is not None, 'No error on Exception'
     assert isinstance(error, Exception), 'Wrong error type'
+
+
+@responses.activate
+@pytest.mark.parametrize('status, is_error', [(200, False), (404, True)])
+def test_session_pool_request(status, is_error):
+    responses.add(responses.GET, TEST_URL, status=status)
+    error, response = safe_requests(TEST_URL, session=SessionPool())
+    assert (error is not None) == is_error
+    assert response.status_code == status
+
+
+def test_session_pool_session_per_thread():
+    session_pool = SessionPool(pool_maxsize=4)
+    session = session_pool.session
+    assert session_pool.session is session
+    with ThreadPoolExecutor(1) as executor:
+        other = executor.submit(lambda: session_pool.session).result()
+    assert other is not session
+    assert other.get_adapter(TEST_URL) is session.get_adapter(TEST_URL)
+
+
+def test_rate_limiter_spaces_acquisitions():
+    rate_limiter = RateLimiter(rate=50)
+    start = time.monotonic()
+    for _ in range(6):
+        rate_limiter.acquire()
+    assert time.monotonic() - start >= 5 / 50
+
+
+def test_rate_limiter_allows_burst():
+    rate_limiter = RateLimiter(rate=1, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        rate_limiter.acquire()
+    assert time.monotonic() - start < 0.5
+
+
+def test_rate_limiter_invalid_rate():
+    with pytest.raises(ValueError):
+        RateLimiter(rate=0)
+
+
+def test_adaptive_batcher_grows_toward_target_latency():
+    batcher = AdaptiveBatcher(initial=100, target_seconds=2, target_bytes=2**30)
+    batcher.record(100, 0.1, 2**10)
+    assert batcher.size == 200
+    for _ in range(10):
+        batcher.record(batcher.size, batcher.size * 0.001, 2**10)
+    assert 1500 <= batcher.size <= 2000
+
+
+def test_adaptive_batcher_shrinks_to_target_bytes():
+    batcher = AdaptiveBatcher(initial=1000, target_bytes=2**20)
+    batcher.record(1000, 0.1, 1000 * 2**12)
+    assert batcher.size == 2**8
+
+
+def test_adaptive_batcher_halves_on_error():
+    batcher = AdaptiveBatcher(initial=100, minimum=30)
+    batcher.record_error()
+    assert batcher.size == 50
+    batcher.record_error()
+    assert batcher.size == 30
+
+
+def test_adaptive_batcher_invalid_sizes():
+    with pytest.raises(ValueError):
+        AdaptiveBatcher(initial=10, minimum=20)
+
+
+@responses.activate
+def test_retry_until_ok():
+    responses.add(responses.GET, TEST_URL, status=503)
+    responses.add(responses.GET, TEST_URL, body=Timeout())
+    responses.add(responses.GET, TEST_URL, status=200)
+    retry = RetryPolicy(backoff_factor=0)
+    error, response = safe_requests(TEST_URL, retry=retry)
+    assert error is None
+    assert response.status_code == 200
+    assert retry.counters == {'attempts': 3, 'retries': 2, 'status:503': 1, 'exception:Timeout': 1}
+
+
+class FlakyBodySession:
+    """Serves responses whose body fails to read the first given number of times"""
+
+    class Response:
+        ok = True
+        status_code = 200
+        headers: dict = {}
+
+        def __init__(self, fail):
+            self.fail = fail
+            self.closed = False
+
+        @property
+        def content(self):
+            if self.fail:
+                raise ChunkedEncodingError('Connection broken')
+            return b'body'
+
+        def close(self):
+            self.closed = True
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.responses = []
+
+    def request(self, method, url, **opts):
+        self.responses.append(self.Response(len(self.responses) < self.failures))
+        return self.responses[-1]
+
+
+@pytest.mark.parametrize('read_body, retried', [(True, True), (False, False)])
+def test_retry_on_body_read(read_body, retried):
+    session = FlakyBodySession(failures=1)
+    retry = RetryPolicy(backoff_factor=0)
+    error, response = safe_requests(TEST_URL, session=session, retry=retry, read_body=read_body)
+    assert error is None
+    assert len(session.responses) == (2 if retried else 1)
+    assert session.responses[0].closed == retried
+    if retried:
+        assert response.content == b'body'
+        assert retry.counters['exception:ChunkedEncodingError'] == 1
+
+
+@responses.activate
+@pytest.mark.parametrize('status, calls', [(404, 1), (429, 2)])
+def test_retry_gives_up(status, calls):
+    responses.add(responses.GET, TEST_URL, status=status)
+    retry = RetryPolicy(max_attempts=2, backoff_factor=0)
+    error, _ = safe_requests(TEST_URL, retry=retry)
+    assert isinstance(error, RequestsError)
+    assert len(responses.calls) == calls
+    assert retry.counters.get('exhausted', 0) == calls - 1
+
+
+def test_retry_delay_backoff():
+    retry = RetryPolicy(backoff_factor=1, max_backoff=3, jitter=0)
+    assert [retry.get_delay(attempt) for attempt in range(1, 5)] == [1, 2, 3, 3]
+
+
+def test_retry_delay_honours_retry_after():
+    retry = RetryPolicy()
+    assert retry.get_delay(1, '7') == 7
+    assert retry.get_delay(1, 'Wed, 21 Oct 2015 07:28:00 GMT') == 0
+    assert retry.get_delay(1, 'soon') <= retry.backoff_factor * (1 + retry.jitter)
+
+
+def test_retry_delay_caps_retry_after():
+    retry = RetryPolicy(max_retry_after=10)
+    assert retry.get_delay(1, '3600') == 10
+    assert retry.get_delay(1, 'Wed, 21 Oct 2099 07:28:00 GMT') == 10
@@ -0,0 +1,42 @@
+import pickle
+import pytest
+from ncbiutils.metrics import Metrics, _timer, _call
+
+
+def test_count_and_update():
+    metrics = Metrics()
+    metrics.count('articles')
+    metrics.count('bytes:download', 100)
+    metrics.update({'articles': 2, 'bytes:download': 50})
+    assert metrics.counters == {'articles': 3, 'bytes:download': 150}
+
+
+def test_timer_records_seconds_and_calls_on_error():
+    metrics = Metrics()
+    with pytest.raises(ValueError):
+        with metrics.timer('parse'):
+            raise ValueError()
+    assert metrics.call('parse', sum, [1, 2]) == 3
+    assert metrics.counters['calls:parse'] == 2
+    assert metrics.counters['seconds:parse'] >= 0
+
+
+def test_callback_receives_increments():
+    received = []
+    metrics = Metrics(callback=lambda key, value: received.append((key, value)))
+    metrics.count('articles', 2)
+    assert received == [('articles', 2)]
+
+
+def test_pickled_copy_starts_empty():
+    metrics = Metrics(callback=print)
+    metrics.count('articles')
+    copy = pickle.loads(pickle.dumps(metrics))
+    assert copy.counters == {}
+    assert copy.callback is None
+
+
+def test_disabled_helpers():
+    with _timer(None, 'parse'):
+        pass
+    assert _call('field:title', str.upper, 'title') == 'TITLE'
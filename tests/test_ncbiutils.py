@@ -1,6 +1,26 @@
+import io
+import multiprocessing
 import pytest
-from ncbiutils.ncbiutils import Eutil, Efetch, PubMedFetch, PubMedDownload
-from ncbiutils.types import DbEnum, RetTypeEnum, RetModeEnum, DownloadPathEnum
+from datetime import datetime, timedelta
+from requests.exceptions import ChunkedEncodingError
+from ncbiutils.ncbiutils import (
+    Eutil,
+    Efetch,
+    Esearch,
+    Esummary,
+    Elink,
+    Link,
+    PubMedFetch,
+    PubMedDownload,
+    SearchResult,
+    _get_parser,
+)
+from ncbiutils.cache import CitationCache
+from ncbiutils.http import AdaptiveBatcher, RequestsError
+from ncbiutils.metrics import Metrics
+from ncbiutils.pmcxmlparser import PmcXmlParser
+from ncbiutils.pubmed import CitationRecord, _project
+from ncbiutils.types import DbEnum, RetTypeEnum, RetModeEnum, LinkCmdEnum, IdStatusEnum, DownloadPathEnum
 
 
 NCBI_EUTILS_BASE_URL = 'https://eutils.ncbi.nlm.nih.gov/entrez/eutils/'
@@ -16,6 +36,25 @@ class MockResponse:
         self.content = content
 
 
+class MockTimedResponse(MockResponse):
+    def __init__(self, content, seconds=0.1):
+        super().__init__(content)
+        self.elapsed = timedelta(seconds=seconds)
+
+
+class MockTextResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class MockStreamResponse:
+    def __init__(self, content):
+        self.raw = io.BytesIO(content)
+
+    def close(self):
+        self.raw.close()
+
+
 # #############################
 # #   Unit tests
 # #############################
@@ -30,17 +69,142 @@ class TestEutilClass:
         eutil = Eutil(api_key=key)
         assert eutil.api_key == key
 
+    def test_default_requests_per_second(self):
+        assert Eutil().requests_per_second == Eutil.rate_limit
+        assert Eutil(api_key='somekey').requests_per_second == Eutil.rate_limit_api_key
+        assert Eutil(requests_per_second=1).requests_per_second == 1
+
+    def test_rate_limiter_shared(self):
+        assert Eutil()._get_rate_limiter() is Eutil()._get_rate_limiter()
+        assert Eutil()._get_rate_limiter() is not Eutil(api_key='somekey')._get_rate_limiter()
+
+    def test_rate_limiter_lowest_rate_per_key(self):
+        rate_limiter = Eutil(api_key='lowestkey', requests_per_second=5)._get_rate_limiter()
+        assert Eutil(api_key='lowestkey', requests_per_second=2)._get_rate_limiter() is rate_limiter
+        assert Eutil(api_key='lowestkey', requests_per_second=8)._get_rate_limiter() is rate_limiter
+        assert rate_limiter.rate == 2
+
     def test_set_invalid_retmax(self):
         bigger_than_retmax_limit = Eutil.retmax_limit + 1
         with pytest.raises(Exception):
             Eutil(retmax=bigger_than_retmax_limit)
 
+    def test_request_repeats_list_params(self, mocker):
+        safe_requests = mocker.patch('ncbiutils.ncbiutils.safe_requests', return_value=(None, None))
+        Eutil().request('url', db='pubmed', id=['1', '2'])
+        assert safe_requests.call_args.kwargs['files'] == [
+            ('retstart', 0),
+            ('retmax', Eutil.retmax_limit),
+            ('db', 'pubmed'),
+            ('id', '1'),
+            ('id', '2'),
+        ]
+
 
 class TestEfetchClass:
     def test_class_attributes(self):
         assert Efetch.url == f'{NCBI_EUTILS_BASE_URL}efetch.fcgi'
 
 
+class TestEsearchClass:
+    def test_class_attributes(self):
+        assert Esearch.url == f'{NCBI_EUTILS_BASE_URL}esearch.fcgi'
+
+    def test_search(self, mocker, shared_datadir):
+        data = (shared_datadir / 'esearch.xml').read_bytes()
+        request = mocker.patch('ncbiutils.ncbiutils.Eutil.request', return_value=(None, MockResponse(data)))
+        error, result = Esearch(retmax=2).search('sirt3')
+        assert error is None
+        assert result == SearchResult(5, 'MCID_62a1e1f5b4d2c36d4a0b9c8e', '1', ['35196497', '33278872'])
+        assert request.call_args.kwargs['usehistory'] == 'y'
+        assert request.call_args.kwargs['term'] == 'sirt3'
+
+    def test_retmax_default(self):
+        assert Esearch().retmax == 0
+        assert Esearch(retmax=20).retmax == 20
+        assert Esearch(usehistory=False).retmax == Esearch.retmax_limit
+
+    def test_search_on_error(self, mocker, shared_datadir):
+        data = (shared_datadir / 'esearch_error.xml').read_bytes()
+        mocker.patch('ncbiutils.ncbiutils.Eutil.request', return_value=(None, MockResponse(data)))
+        error, result = Esearch().search('sirt3')
+        assert isinstance(error, ValueError)
+        assert result is None
+
+
+class TestEsummaryClass:
+    def test_class_attributes(self):
+        assert Esummary.url == f'{NCBI_EUTILS_BASE_URL}esummary.fcgi'
+
+    def test_set_unsupported_retmode(self):
+        with pytest.raises(ValueError):
+            Esummary(retmode=RetModeEnum.text)
+
+    @pytest.mark.parametrize('retmode, file', [(RetModeEnum.json, 'esummary.json'), (RetModeEnum.xml, 'esummary.xml')])
+    def test_get_summaries(self, mocker, shared_datadir, retmode, file):
+        data = (shared_datadir / file).read_bytes()
+        summarize = mocker.patch('ncbiutils.ncbiutils.Esummary.summarize', return_value=(None, MockResponse(data)))
+        uids = ['35196497', '33278872', '0', '1']
+        chunks = list(Esummary(retmode=retmode, retmax=3, max_workers=2).get_summaries(uids))
+        assert [call.args[0] for call in summarize.call_args_list] == [uids[:3], uids[3:]]
+        assert [chunk.ids for chunk in chunks] == [uids[:3], uids[3:]]
+        assert [summary.uid for summary in chunks[0].citations] == ['35196497', '33278872']
+
+    def test_get_summaries_on_parse_error(self, mocker):
+        mocker.patch('ncbiutils.ncbiutils.Esummary.summarize', return_value=(None, MockResponse(b'{}')))
+        chunk = next(Esummary().get_summaries(['1']))
+        assert isinstance(chunk.error, ValueError)
+        assert chunk.citations is None
+
+
+class TestElinkClass:
+    def test_class_attributes(self):
+        assert Elink.url == f'{NCBI_EUTILS_BASE_URL}elink.fcgi'
+
+    def test_link(self, mocker):
+        request = mocker.patch('ncbiutils.ncbiutils.Eutil.request', return_value=(None, None))
+        Elink(db=DbEnum.pmc, linkname='pubmed_pmc', cmd=LinkCmdEnum.neighbor_score).link(['1', '2'])
+        assert request.call_args.kwargs == {
+            'dbfrom': DbEnum.pubmed,
+            'db': DbEnum.pmc,
+            'id': ['1', '2'],
+            'linkname': 'pubmed_pmc',
+            'cmd': LinkCmdEnum.neighbor_score,
+        }
+
+    def test_get_links(self, mocker, shared_datadir):
+        data = (shared_datadir / 'elink.xml').read_bytes()
+        link = mocker.patch('ncbiutils.ncbiutils.Elink.link', return_value=(None, MockResponse(data)))
+        uids = ['33278872', '35196497', '0', '1']
+        chunks = list(Elink(retmax=3, max_workers=2).get_links(uids))
+        assert [call.args[0] for call in link.call_args_list] == [uids[:3], uids[3:]]
+        assert [chunk.ids for chunk in chunks] == [uids[:3], uids[3:]]
+        assert chunks[0].citations == [
+            Link('33278872', '7719180', 'pubmed_pmc'),
+            Link('33278872', '36243890', 'pubmed_pubmed_citedin'),
+            Link('33278872', '35196497', 'pubmed_pubmed_citedin'),
+            Link('35196497', '37532871', 'pubmed_pubmed_citedin'),
+        ]
+
+    def test_get_links_neighbor_score(self, mocker, shared_datadir):
+        data = (shared_datadir / 'elink_score.xml').read_bytes()
+        mocker.patch('ncbiutils.ncbiutils.Elink.link', return_value=(None, MockResponse(data)))
+        elink = Elink(linkname='pubmed_pubmed', cmd=LinkCmdEnum.neighbor_score)
+        chunk = next(elink.get_links(['33278872']))
+        assert chunk.citations == [
+            Link('33278872', '33278872', 'pubmed_pubmed', 100000000),
+            Link('33278872', '31577524', 'pubmed_pubmed', 43541766),
+        ]
+
+    def test_get_links_on_error(self, mocker, shared_datadir):
+        data = (shared_datadir / 'elink_error.xml').read_bytes()
+        mocker.patch('ncbiutils.ncbiutils.Elink.link', return_value=(None, MockResponse(data)))
+        chunk = next(Elink().get_links(['1']))
+        assert isinstance(chunk.error, ValueError)
+        assert str(chunk.error) == 'Invalid dbfrom parameter'
+        assert chunk.citations is None
+
+
 class TestPubMedFetchClass:
     pubmed_fetch = PubMedFetch()
 
@@ -76,6 +240,206 @@ class TestPubMedFetchClass:
         assert len(chunk.ids) == len(uids)
         assert len(chunk.citations) == len(uids)
 
+    def test_get_citations_concurrent(self, mocker, pubmed_data):
+        uids = [str(uid) for uid in range(10)]
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, MockResponse(pubmed_data)))
+        pubmed_fetch = PubMedFetch(retmax=2, max_workers=3)
+        chunks = list(pubmed_fetch.get_citations(uids))
+        assert [chunk.ids for chunk in chunks] == [uids[i : i + 2] for i in range(0, len(uids), 2)]
+        assert all(chunk.error is None and len(chunk.citations) == 5 for chunk in chunks)
+
+    def test_get_citations_adaptive(self, mocker, pubmed_data):
+        uids = [str(uid) for uid in range(100)]
+        fetch = mocker.patch(
+            'ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, MockTimedResponse(pubmed_data))
+        )
+        batcher = AdaptiveBatcher(initial=10, minimum=5, target_seconds=1, target_bytes=2**30)
+        chunks = list(PubMedFetch(retmax=30, batcher=batcher).get_citations(uids))
+        assert [len(call.args[0]) for call in fetch.call_args_list] == [10, 20, 30, 30, 10]
+        assert sum((chunk.ids for chunk in chunks), []) == uids
+        assert all(chunk.error is None for chunk in chunks)
+
+    @pytest.mark.parametrize('max_workers', [1, 2])
+    def test_get_citations_adaptive_splits_failed_batch(self, mocker, pubmed_data, max_workers):
+        def fetch(ids):
+            if len(ids) > 5:
+                return RequestsError(504), None
+            if '7' in ids:
+                return None, MockTimedResponse(b'<html></html>')
+            return None, MockTimedResponse(pubmed_data)
+
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', side_effect=fetch)
+        uids = [str(uid) for uid in range(20)]
+        batcher = AdaptiveBatcher(initial=20, minimum=2)
+        chunks = list(PubMedFetch(batcher=batcher, max_workers=max_workers).get_citations(uids))
+        assert [chunk.ids for chunk in chunks] == [uids[0:5], uids[5:8], uids[8:10], uids[10:15], uids[15:20]]
+        assert [chunk.error is None for chunk in chunks] == [True, False, True, True, True]
+        assert isinstance(chunks[1].error, ValueError)
+
+    def test_get_citations_adaptive_keeps_client_error(self, mocker):
+        fetch = mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(RequestsError(400), None))
+        uids = [str(uid) for uid in range(20)]
+        chunks = list(PubMedFetch(batcher=AdaptiveBatcher(initial=20, minimum=2)).get_citations(uids))
+        assert fetch.call_count == 1
+        assert [chunk.ids for chunk in chunks] == [uids]
+
+    def test_get_citations_status_requeues_missing(self, mocker, fetch_response):
+        empty = MockResponse(b'<PubmedArticleSet></PubmedArticleSet>')
+        fetch = mocker.patch(
+            'ncbiutils.ncbiutils.PubMedFetch.fetch', side_effect=[(None, fetch_response), (None, empty)]
+        )
+        uids = ['35196497', '33278872', '0', '24792780', '30158200', '151222']
+        chunks = list(self.pubmed_fetch.get_citations_status(uids))
+        found = [uid for uid in uids if uid != '0']
+        assert [call.args[0] for call in fetch.call_args_list] == [uids, ['0']]
+        assert [chunk.ids for chunk in chunks] == [found, ['0']]
+        assert chunks[0].status == {uid: IdStatusEnum.found for uid in found}
+        assert len(chunks[0].citations) == len(found)
+        assert chunks[1].status == {'0': IdStatusEnum.missing}
+        assert chunks[1].citations == []
+
+    def test_get_citations_status_requeues_errored(self, mocker, fetch_response):
+        fetch = mocker.patch(
+            'ncbiutils.ncbiutils.PubMedFetch.fetch',
+            side_effect=[(RequestsError(503), None), (None, fetch_response), (RequestsError(503), None)],
+        )
+        uids = ['35196497', '33278872', '24792780', '30158200', '151222']
+        chunks = list(PubMedFetch().get_citations_status(uids, attempts=3))
+        assert fetch.call_count == 2
+        assert len(chunks) == 1
+        assert chunks[0].error is None
+        assert chunks[0].ids == uids
+        assert set(chunks[0].status.values()) == {IdStatusEnum.found}
+
+    @pytest.mark.parametrize('attempts', [0, -1])
+    def test_get_citations_status_invalid_attempts(self, attempts):
+        with pytest.raises(ValueError):
+            next(self.pubmed_fetch.get_citations_status(['1'], attempts=attempts))
+
+    def test_get_citations_status_reports_errored(self, mocker):
+        error = RequestsError(503)
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(error, None))
+        chunks = list(PubMedFetch().get_citations_status(['1', '2']))
+        assert chunks == [(error, None, ['1', '2'], {'1': IdStatusEnum.errored, '2': IdStatusEnum.errored})]
+
+    @pytest.mark.parametrize('db, file', [(DbEnum.pubmed, 'pubmed.xml'), (DbEnum.pmc, 'pmc.xml')])
+    def test_get_citations_stream(self, mocker, shared_datadir, db, file):
+        data = (shared_datadir / file).read_bytes()
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, MockResponse(data)))
+        read = next(PubMedFetch(db=db).get_citations(['1']))
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, MockStreamResponse(data)))
+        streamed = next(PubMedFetch(db=db, stream=True).get_citations(['1']))
+        assert streamed.error is None
+        assert streamed.citations == read.citations
+
+    def test_get_citations_stream_adaptive(self, mocker, pubmed_data):
+        response = MockStreamResponse(pubmed_data)
+        response.elapsed = timedelta(seconds=0.1)
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, response))
+        record = mocker.spy(AdaptiveBatcher, 'record')
+        chunk = next(PubMedFetch(stream=True, batcher=AdaptiveBatcher()).get_citations(['1']))
+        assert len(chunk.citations) == 5
+        assert record.call_args.args[3] == len(pubmed_data)
+
+    def test_parse_stream_raises(self):
+        with pytest.raises(ValueError):
+            PubMedFetch(stream=True)._parse_stream(MockStreamResponse(b'<!DOCTYPE html><html></html>'))
+
+    def test_get_citations_projected(self, mocker, fetch_response):
+        uids = ['35196497', '33278872', '24792780', '30158200', '151222']
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, fetch_response))
+        full = next(self.pubmed_fetch.get_citations(uids))
+        cache = CitationCache(':memory:')
+        cache.put_many('pubmed', {citation.pmid: citation for citation in full.citations[:2]})
+        chunk = next(PubMedFetch(cache=cache, fields={'title'}).get_citations(uids))
+        assert chunk.citations == [_project(citation, frozenset({'title'})) for citation in full.citations]
+        assert all(citation.abstract is None and citation.author_list is None for citation in chunk.citations)
+        assert cache.get_many('pubmed', uids).keys() == set(uids[:2])
+
+    def test_get_citations_projected_pmc_keeps_id(self, mocker, shared_datadir):
+        data = (shared_datadir / 'pmc.xml').read_bytes()
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, MockResponse(data)))
+        pubmed_fetch = PubMedFetch(db=DbEnum.pmc, fields={'title'})
+        chunk = next(pubmed_fetch.get_citations_status(['PMC1', 'PMC2'], attempts=1))
+        assert all(citation.pmc is not None for citation in chunk.citations)
+        assert all(citation.author_list is None for citation in chunk.citations)
+
+    def test_parsers_shared(self):
+        pubmed_fetch = PubMedFetch(db=DbEnum.pmc, compact=True, fields={'title'})
+        parser = _get_parser(PmcXmlParser, True, frozenset({'title', 'pmc'}))
+        assert _get_parser(PmcXmlParser, True, pubmed_fetch._parser_fields()) is parser
+        assert _get_parser(PmcXmlParser, False, pubmed_fetch._parser_fields()) is not parser
+
+    def test_get_citations_cached(self, mocker, fetch_response):
+        uids = ['35196497', '33278872', '24792780', '30158200', '151222']
+        fetch = mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, fetch_response))
+        cold = next(self.pubmed_fetch.get_citations(uids))
+        pubmed_fetch = PubMedFetch(cache=CitationCache(':memory:'))
+        first = next(pubmed_fetch.get_citations(uids))
+        second = next(pubmed_fetch.get_citations(uids))
+        assert fetch.call_count == 2
+        assert first == cold
+        assert second == cold
+
+    def test_get_citations_cached_fetches_misses(self, mocker, fetch_response):
+        uids = ['35196497', '33278872', '24792780', '30158200', '151222']
+        fetch = mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, fetch_response))
+        cold = next(self.pubmed_fetch.get_citations(uids))
+        cache = CitationCache(':memory:')
+        cache.put_many('pubmed', {citation.pmid: citation for citation in cold.citations[:2]})
+        chunk = next(PubMedFetch(cache=cache).get_citations(uids))
+        assert fetch.call_args.args == ([citation.pmid for citation in cold.citations[2:]],)
+        assert chunk == cold
+
+    def test_get_citations_compact_cached(self, mocker, fetch_response):
+        uids = ['35196497', '33278872', '24792780', '30158200', '151222']
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(None, fetch_response))
+        cold = next(self.pubmed_fetch.get_citations(uids))
+        cache = CitationCache(':memory:')
+        pubmed_fetch = PubMedFetch(cache=cache, compact=True)
+        first = next(pubmed_fetch.get_citations(uids))
+        second = next(pubmed_fetch.get_citations(uids))
+        assert all(isinstance(citation, CitationRecord) for citation in first.citations)
+        assert second == first
+        assert [citation.to_citation() for citation in first.citations] == cold.citations
+        assert cache.get_many('pubmed', uids) == {citation.pmid: citation for citation in cold.citations}
+
+    @pytest.mark.parametrize('max_workers', [1, 2])
+    def test_get_search_citations(self, mocker, fetch_response, max_workers):
+        fetch_history = mocker.patch(
+            'ncbiutils.ncbiutils.PubMedFetch.fetch_history', return_value=(None, fetch_response)
+        )
+        result = SearchResult(12, 'MCID_1', '1', [])
+        pubmed_fetch = PubMedFetch(retmax=5, max_workers=max_workers)
+        chunks = list(pubmed_fetch.get_search_citations(result))
+        assert sorted(call.args for call in fetch_history.call_args_list) == [('MCID_1', '1', i) for i in (0, 5, 10)]
+        assert chunks[0].ids == ['35196497', '33278872', '24792780', '30158200', '151222']
+        assert [chunk.retstart for chunk in chunks] == [0, 5, 10]
+
+    def test_get_search_citations_on_parse_error(self, mocker):
+        body = b'<eFetchResult><ERROR>Unable to obtain query #1</ERROR></eFetchResult>'
+        mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch_history', return_value=(None, MockResponse(body)))
+        chunks = list(PubMedFetch(retmax=5).get_search_citations(SearchResult(7, 'MCID_1', '1', [])))
+        assert [chunk.retstart for chunk in chunks] == [0, 5]
+        assert all(isinstance(chunk.error, ValueError) and chunk.citations is None for chunk in chunks)
+
+    @pytest.mark.parametrize('max_workers', [1, 2])
+    def test_get_search_citations_on_failed_middle_page(self, mocker, fetch_response, max_workers):
+        responses = {0: (None, fetch_response), 5: (RequestsError(500), None), 10: (None, fetch_response)}
+        mocker.patch(
+            'ncbiutils.ncbiutils.PubMedFetch.fetch_history',
+            side_effect=lambda webenv, query_key, retstart: responses[retstart],
+        )
+        pubmed_fetch = PubMedFetch(retmax=5, max_workers=max_workers)
+        chunks = list(pubmed_fetch.get_search_citations(SearchResult(12, 'MCID_1', '1', [])))
+        assert [chunk.retstart for chunk in chunks] == [0, 5, 10]
+        assert [chunk.error is None for chunk in chunks] == [True, False, True]
+        assert chunks[1].citations is None and chunks[1].ids is None
+
+    def test_get_search_citations_without_history(self):
+        with pytest.raises(ValueError):
+            next(self.pubmed_fetch.get_search_citations(SearchResult(1, None, None, ['1'])))
+
     def test_get_citations_on_error(self, mocker):
         uids = ['35196497', '33890651', '33279447', '33278872', '24792780', '30158200', '151222']
         mocker.patch('ncbiutils.ncbiutils.PubMedFetch.fetch', return_value=(Exception, None))
@@ -115,6 +479,179 @@ class TestPubMedDownload:
         assert chunk.ids[0] == first_file
         assert len(chunk.citations) == 3
 
+    def test_get_updates(self, mocker, shared_datadir):
+        files = ['pubmed22n1115.xml.gz', 'pubmed22n1313.xml.gz']
+        responses = {
+            f'{NCBI_PUBMED_FTP_URL}updatefiles/{file}': (None, MockResponse((shared_datadir / file).read_bytes()))
+            for file in files
+        }
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', side_effect=lambda url, **opts: responses[url])
+        updates = list(self.pubmed_download.get_updates(files))
+        assert [update.ids for update in updates] == [[file] for file in files]
+        assert [len(update.citations) for update in updates] == [3, 4]
+        assert [len(update.deletions) for update in updates] == [34, 559]
+        assert updates[1].deletions[0].pmid == '21334990'
+        assert updates[1].deletions[0].version == '1'
+
+    def test_get_updates_on_parse_error(self, mocker):
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, MockResponse(b'not gzip')))
+        update = next(self.pubmed_download.get_updates(['pubmed22n1115.xml.gz']))
+        assert update.error is not None
+        assert update.citations is None and update.deletions is None
+
+    def test_get_citations_stream(self, mocker, pubmed_data):
+        files = ['pubmed22n1115.xml.gz', 'pubmed22n1313.xml.gz']
+        mocker.patch(
+            'ncbiutils.ncbiutils.PubMedDownload._request',
+            side_effect=[(None, MockStreamResponse(pubmed_data)), (None, MockStreamResponse(pubmed_data))],
+        )
+        pubmed_download = PubMedDownload(stream=True, retmax=2)
+        chunks = list(pubmed_download.get_citations(files))
+        assert [chunk.ids[0] for chunk in chunks] == [files[0], files[0], files[1], files[1]]
+        assert [len(chunk.citations) for chunk in chunks] == [2, 1, 2, 1]
+        assert all(chunk.error is None for chunk in chunks)
+
+    def test_stream_citations_matches_parse(self, mocker, pubmed_data):
+        mocker.patch(
+            'ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, MockStreamResponse(pubmed_data))
+        )
+        streamed = list(self.pubmed_download.stream_citations('pubmed22n1115.xml.gz'))
+        assert streamed == self.pubmed_download._parse_response(pubmed_data)
+
+    def test_get_citations_concurrent_ordered(self, mocker, shared_datadir):
+        files = ['pubmed22n1115.xml.gz', 'pubmed22n1313.xml.gz', 'missing.xml.gz']
+        responses = {
+            f'{NCBI_PUBMED_FTP_URL}updatefiles/{file}': (None, MockResponse((shared_datadir / file).read_bytes()))
+            for file in files[:2]
+        }
+        responses[f'{NCBI_PUBMED_FTP_URL}updatefiles/{files[2]}'] = (Exception('Not found'), None)
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', side_effect=lambda url, **opts: responses[url])
+        pubmed_download = PubMedDownload(max_downloads=2, max_parsers=2, max_pending=2)
+        chunks = list(pubmed_download.get_citations(files))
+        assert [chunk.ids[0] for chunk in chunks] == files
+        assert [len(chunk.citations) for chunk in chunks[:2]] == [3, 4]
+        assert chunks[2].error is not None
+
+    def test_get_citations_concurrent_unordered(self, mocker, fetch_response):
+        files = [f'pubmed22n{n}.xml.gz' for n in range(1, 6)]
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, fetch_response))
+        pubmed_download = PubMedDownload(max_downloads=3, max_parsers=1, ordered=False)
+        chunks = list(pubmed_download.get_citations(files))
+        assert sorted(chunk.ids[0] for chunk in chunks) == files
+        assert all(chunk.error is None and len(chunk.citations) == 3 for chunk in chunks)
+
+    def test_get_citations_concurrent_on_parse_error(self, mocker):
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, MockResponse(b'not gzip')))
+        pubmed_download = PubMedDownload(max_downloads=2, max_parsers=1)
+        chunk = next(pubmed_download.get_citations(['pubmed22n1115.xml.gz']))
+        assert chunk.error is not None
+        assert chunk.citations is None
+
+    def test_get_citations_on_read_error(self, mocker):
+        class BrokenResponse:
+            @property
+            def content(self):
+                raise ChunkedEncodingError('Connection broken')
+
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, BrokenResponse()))
+        chunks = list(self.pubmed_download.get_citations(['pubmed22n1115.xml.gz', 'pubmed22n1313.xml.gz']))
+        assert [chunk.ids[0] for chunk in chunks] == ['pubmed22n1115.xml.gz', 'pubmed22n1313.xml.gz']
+        assert all(isinstance(chunk.error, ChunkedEncodingError) and chunk.citations is None for chunk in chunks)
+
+    def test_get_citations_on_parse_error(self, mocker):
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, MockResponse(b'not gzip')))
+        chunk = next(self.pubmed_download.get_citations(['pubmed22n1115.xml.gz']))
+        assert chunk.error is not None
+        assert chunk.citations is None
+
+    def test_get_citations_concurrent_mp_context(self, mocker, fetch_response):
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, fetch_response))
+        pubmed_download = PubMedDownload(
+            max_downloads=2, max_parsers=1, mp_context=multiprocessing.get_context('fork')
+        )
+        chunks = list(pubmed_download.get_citations(['pubmed22n1.xml.gz', 'pubmed22n2.xml.gz']))
+        assert all(chunk.error is None and len(chunk.citations) == 3 for chunk in chunks)
+
+    def test_concurrent_stream_raises(self):
+        with pytest.raises(ValueError):
+            PubMedDownload(stream=True, max_downloads=2)
+
+    def test_get_citations_stream_on_truncated_file(self, mocker, pubmed_data):
+        truncated = MockStreamResponse(pubmed_data[: len(pubmed_data) // 2])
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, truncated))
+        pubmed_download = PubMedDownload(stream=True)
+        chunk = list(pubmed_download.get_citations(['pubmed22n1115.xml.gz']))[-1]
+        assert chunk.error is not None
+
+    def test_get_citations_metrics(self, mocker, fetch_response, pubmed_data):
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, fetch_response))
+        metrics = Metrics()
+        chunk = next(PubMedDownload(metrics=metrics).get_citations(['pubmed22n1115.xml.gz']))
+        assert chunk.citations == self.pubmed_download._parse_response(pubmed_data)
+        counters = metrics.counters
+        assert counters['bytes:download'] == len(pubmed_data)
+        assert counters['bytes:decompress'] > len(pubmed_data)
+        assert all(counters[f'calls:{stage}'] == 1 for stage in ('download', 'decompress', 'from_raw', 'parse'))
+        assert counters['articles'] == counters['calls:field:title'] == 3
+
+    def test_get_citations_concurrent_metrics(self, mocker, fetch_response):
+        mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, fetch_response))
+        metrics = Metrics()
+        pubmed_download = PubMedDownload(max_downloads=2, max_parsers=1, metrics=metrics)
+        list(pubmed_download.get_citations(['pubmed22n1.xml.gz', 'pubmed22n2.xml.gz']))
+        assert metrics.counters['calls:decompress'] == 2
+        assert metrics.counters['articles'] == 6
+
+    def test_stream_citations_metrics(self, mocker, pubmed_data):
+        mocker.patch(
+            'ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, MockStreamResponse(pubmed_data))
+        )
+        metrics = Metrics()
+        list(PubMedDownload(metrics=metrics).stream_citations('pubmed22n1115.xml.gz'))
+        assert metrics.counters['articles'] == 3
+        assert metrics.counters['bytes:download'] == len(pubmed_data)
+
+
+class TestPubMedDownloadListing:
+    @pytest.fixture(autouse=True)
+    def listing(self, mocker, shared_datadir):
+        mocker.patch.dict(PubMedDownload._listings, clear=True)
+        html = (shared_datadir / 'updatefiles.html').read_text()
+        return mocker.patch('ncbiutils.ncbiutils.PubMedDownload._request', return_value=(None, MockTextResponse(html)))
+
+    def test_list_files(self):
+        files = PubMedDownload().list_files()
+        assert [file.name for file in files] == [
+            'pubmed22n1115.xml.gz',
+            'pubmed22n1116.xml.gz',
+            'pubmed22n1313.xml.gz',
+            'pubmed23n1167.xml.gz',
+        ]
+        assert files[0].year == 2022
+        assert files[0].sequence == 1115
+        assert files[0].size == 23 * 2**20
+        assert files[1].size == int(5.5 * 2**20)
+        assert files[3].size == 812
+        assert files[0].modified == datetime(2021, 12, 15, 14, 3)
+
+    @pytest.mark.parametrize(
+        'year, start, end, expected',
+        [(2022, None, None, [1115, 1116, 1313]), (None, 1116, 1200, [1116, 1167]), (2023, 1200, None, [])],
+    )
+    def test_list_files_filtered(self, year, start, end, expected):
+        files = PubMedDownload().list_files(year=year, start=start, end=end)
+        assert [file.sequence for file in files] == expected
+
+    def test_list_files_cached(self, listing):
+        pubmed_download = PubMedDownload()
+        pubmed_download.list_files()
+        pubmed_download.list_files(year=2022)
+        PubMedDownload().list_files(DownloadPathEnum.baseline)
+        assert [call.args[0] for call in listing.call_args_list] == [
+            f'{PubMedDownload.base_url}updatefiles/',
+            f'{PubMedDownload.base_url}baseline/',
+        ]
+
 
 class TestPubMedFetchPmcClass:
     pubmed_fetch = PubMedFetch(db=DbEnum.pmc)
@@ -1,7 +1,8 @@
+import io
 import pytest
-from ncbiutils.pmcxmlparser import PmcXmlParser
-from ncbiutils.pubmed import Citation
-from ncbiutils.xml import _from_raw
+from ncbiutils.pmcxmlparser import PmcXmlParser, References
+from ncbiutils.pubmed import Citation, CitationRecord, _project
+from ncbiutils.xml import _from_raw, _iterparse
 
 #############################
 #   Unit tests
@@ -23,6 +24,59 @@ class TestPmcXmlParserClass(object):
         assert first_result is not None
         assert isinstance(first_result, Citation)
 
+    def test_parse_compact_matches_parse(self, shared_datadir):
+        data = (shared_datadir / 'pmc_author.xml').read_bytes()
+        records = list(PmcXmlParser(compact=True).parse(_from_raw(data)))
+        assert all(isinstance(record, CitationRecord) for record in records)
+        assert [record.to_citation() for record in records] == list(self.xmlparser.parse(_from_raw(data)))
+
+    def test_parse_projection(self, author_xml):
+        fields = frozenset({'pmc', 'title', 'correspondence'})
+        projected = list(PmcXmlParser(fields=fields).parse(author_xml))
+        assert projected == [_project(citation, fields) for citation in self.xmlparser.parse(author_xml)]
+        assert all(citation.author_list is None and citation.abstract is None for citation in projected)
+
+    def test_shared_affiliation_text_extracted_once(self, author_xml):
+        citation = next(PmcXmlParser(compact=True).parse(author_xml))
+        affiliations = [affiliation for author in citation.author_list for affiliation in author.affiliations or []]
+        shared = {}
+        assert len(set(affiliations)) < len(affiliations)
+        assert all(shared.setdefault(affiliation, affiliation) is affiliation for affiliation in affiliations)
+
+    def test_unresolved_references_ignored(self):
+        data = b"""<article><front>
+            <contrib contrib-type="author">
+                <xref ref-type="aff" rid="a1"/><xref ref-type="aff" rid="missing"/><xref ref-type="aff" rid="b1"/>
+                <xref ref-type="corresp" rid="c1"/><xref ref-type="corresp" rid="c2"/>
+            </contrib>
+            <aff id="a1">Institute</aff>
+            <author-notes><corresp id="c1"><email>doe@example.org</email></corresp></author-notes>
+            <corresp id="c2"><email>elsewhere@example.org</email></corresp>
+        </front><back><aff id="b1">Back matter</aff></back></article>"""
+        article = _from_raw(data).getroot()
+        references = References(article)
+        author = article.find('front/contrib')
+        assert self.xmlparser._get_affiliations(author, references) == ['Institute']
+        assert self.xmlparser._get_emails(author, references) == ['doe@example.org']
+
+    @pytest.mark.parametrize('file', ['pmc.xml', 'pmc_author.xml'])
+    def test_iterparse_matches_parse(self, shared_datadir, file):
+        data = (shared_datadir / file).read_bytes()
+        streamed = list(self.xmlparser.iterparse(io.BytesIO(data)))
+        assert streamed == list(self.xmlparser.parse(_from_raw(data)))
+
+    def test_iterparse_clears_skipped(self, shared_datadir):
+        data = (shared_datadir / 'pmc.xml').read_bytes()
+        articles = _iterparse(io.BytesIO(data), 'article', 'pmc-articleset', skip=PmcXmlParser.skip_tags)
+        for article in articles:
+            assert all(len(part) == 0 and not part.text for part in article.iterfind('body'))
+            assert article.find('front') is not None
+
+    def test_iterparse_no_pmc_articleset(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        with pytest.raises(ValueError):
+            list(self.xmlparser.iterparse(io.BytesIO(data)))
+
     def test_get_pmc_article_set(self, author_xml):
         pubmed_article_set = self.xmlparser._get_PmcArticleSet(author_xml)
         assert len(pubmed_article_set) == 3
@@ -1,6 +1,9 @@
+import io
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from ncbiutils.metrics import Metrics
 from ncbiutils.pubmedxmlparser import PubmedXmlParser
-from ncbiutils.pubmed import Citation
+from ncbiutils.pubmed import Citation, CitationRecord, DeletedCitation, Journal, _project
 from ncbiutils.xml import _from_raw
 
 #############################
@@ -30,6 +33,116 @@ class TestPubmedXmlParserClass(object):
         assert first_result is not None
         assert isinstance(first_result, Citation)
 
+    @pytest.mark.parametrize('compact', [False, True])
+    def test_parse_projection(self, shared_datadir, compact):
+        xml_tree = _from_raw((shared_datadir / 'pubmed.xml').read_bytes())
+        fields = {'title', 'abstract'}
+        projected = list(PubmedXmlParser(compact=compact, fields=fields).parse(xml_tree))
+        full = list(PubmedXmlParser(compact=compact).parse(xml_tree))
+        assert projected == [_project(citation, frozenset(fields)) for citation in full]
+        citation = projected[0] if not compact else projected[0].to_citation()
+        assert citation.pmid == full[0].pmid
+        assert citation.title == full[0].title
+        assert citation.author_list is None
+        assert citation.journal == Journal()
+        assert citation.publication_type_list == []
+
+    def test_parse_projection_unknown_field(self):
+        with pytest.raises(ValueError):
+            PubmedXmlParser(fields={'pmid', 'authors'})
+
+    def test_iterparse_matches_parse(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        streamed = list(self.xmlparser.iterparse(io.BytesIO(data)))
+        assert len(streamed) == 5
+        assert streamed == list(self.xmlparser.parse(_from_raw(data)))
+
+    @pytest.mark.parametrize('file', ['pubmed.xml', 'pubmed22n1313.xml', 'duplicate.xml'])
+    def test_parse_parallel_matches_parse(self, shared_datadir, file):
+        data = (shared_datadir / file).read_bytes()
+        parallel = list(self.xmlparser.parse_parallel(data, max_workers=2, size=2))
+        assert parallel == list(self.xmlparser.parse(_from_raw(data)))
+
+    def test_parse_metrics(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        fields = {'title', 'author_list'}
+        metrics = Metrics()
+        measured = list(PubmedXmlParser(fields=fields, metrics=metrics).parse(_from_raw(data)))
+        assert measured == list(PubmedXmlParser(fields=fields).parse(_from_raw(data)))
+        counters = metrics.counters
+        assert counters['articles'] == 5
+        assert counters['calls:field:title'] == counters['calls:field:author_list'] == 5
+        assert 'calls:field:abstract' not in counters
+
+    @pytest.mark.parametrize('parser', [PubmedXmlParser(compact=True), PubmedXmlParser(fields={'pmid', 'title'})])
+    def test_parse_parallel_options_match_parse(self, shared_datadir, parser):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        parallel = list(parser.parse_parallel(data, max_workers=2, size=2))
+        assert parallel == list(parser.parse(_from_raw(data)))
+
+    def test_parse_parallel_bounds_submissions(self, mocker, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        mocker.patch(
+            'ncbiutils.pubmedxmlparser.ProcessPoolExecutor',
+            side_effect=lambda max_workers, mp_context: ThreadPoolExecutor(max_workers),
+        )
+        submit = mocker.spy(ThreadPoolExecutor, 'submit')
+        citations = self.xmlparser.parse_parallel(data, max_workers=1, size=1)
+        assert isinstance(next(citations), Citation)
+        assert submit.call_count == 2
+        assert len(list(citations)) == 4
+        assert submit.call_count == 5
+
+    def test_parse_parallel_metrics(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        metrics = Metrics()
+        list(PubmedXmlParser(metrics=metrics).parse_parallel(data, max_workers=2, size=2))
+        assert metrics.counters['articles'] == 5
+
+    def test_parse_parallel_no_pubmedarticleset(self, shared_datadir):
+        data = (shared_datadir / 'no_pubmedarticleset.xml').read_bytes()
+        with pytest.raises(ValueError):
+            list(self.xmlparser.parse_parallel(data))
+
+    def test_parse_compact_matches_parse(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        citations = list(self.xmlparser.parse(_from_raw(data)))
+        records = list(PubmedXmlParser(compact=True).parse(_from_raw(data)))
+        assert all(isinstance(record, CitationRecord) for record in records)
+        assert [record.to_citation() for record in records] == citations
+        assert [CitationRecord.from_citation(citation) for citation in citations] == records
+
+    def test_parse_compact_interns_repeated_strings(self, shared_datadir):
+        data = (shared_datadir / 'double.xml').read_bytes()
+        first, _ = PubmedXmlParser(compact=True).parse(_from_raw(data))
+        first_again, _ = PubmedXmlParser(compact=True).parse(_from_raw(data))
+        assert first.journal.title is first_again.journal.title
+        assert first.publication_type_list[0] is first_again.publication_type_list[0]
+
+    def test_parse_updates(self, shared_datadir):
+        data = (shared_datadir / 'pubmed22n1313.xml').read_bytes()
+        items = list(self.xmlparser.parse_updates(_from_raw(data)))
+        citations = [item for item in items if isinstance(item, Citation)]
+        deletions = [item for item in items if isinstance(item, DeletedCitation)]
+        assert citations == list(self.xmlparser.parse(_from_raw(data)))
+        assert items == citations + deletions
+        assert len(deletions) == 559
+        assert deletions[-1] == DeletedCitation(pmid=deletions[-1].pmid, version='1')
+
+    def test_parse_version(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        assert {citation.version for citation in self.xmlparser.parse(_from_raw(data))} == {'1'}
+
+    def test_parse_matches_validated_models(self, shared_datadir):
+        data = (shared_datadir / 'pubmed.xml').read_bytes()
+        for citation in self.xmlparser.parse(_from_raw(data)):
+            assert Citation(**citation.dict()) == citation
+
+    def test_iterparse_no_pubmedarticleset(self, shared_datadir):
+        data = (shared_datadir / 'no_pubmedarticleset.xml').read_bytes()
+        with pytest.raises(ValueError):
+            list(self.xmlparser.iterparse(io.BytesIO(data)))
+
     def test_get_pubmed_article_set(self, double_xml):
         pubmed_article_set = self.xmlparser._get_PubmedArticleSet(double_xml)
         assert len(pubmed_article_set) == 2
@@ -0,0 +1,135 @@
+import hashlib
+import re
+import pytest
+import responses
+from ncbiutils.ncbiutils import PubMedDownload
+from ncbiutils.sync import PubMedSync, SyncLedger
+from ncbiutils.types import DownloadPathEnum
+
+FILE = 'pubmed22n1115.xml.gz'
+FILE_URL = f'{PubMedDownload.base_url}updatefiles/{FILE}'
+
+#############################
+#   Unit tests
+#############################
+
+
+@pytest.fixture
+def data(shared_datadir):
+    return (shared_datadir / FILE).read_bytes()
+
+
+@pytest.fixture
+def md5(data):
+    return hashlib.md5(data).hexdigest()
+
+
+def add_md5(md5):
+    responses.add(responses.GET, f'{FILE_URL}.md5', body=f'MD5({FILE})= {md5}\n')
+
+
+def file_calls():
+    return [call for call in responses.calls if call.request.url == FILE_URL]
+
+
+@responses.activate
+def test_sync_skips_unchanged(data, md5):
+    add_md5(md5)
+    responses.add(responses.GET, FILE_URL, body=data)
+    pubmed_sync = PubMedSync(ledger=SyncLedger(':memory:'))
+    first = list(pubmed_sync.sync([FILE]))
+    second = list(pubmed_sync.sync([FILE]))
+    assert [len(chunk.citations) for chunk in first] == [3]
+    assert second == []
+    assert len(file_calls()) == 1
+    entry = pubmed_sync.ledger.get('updatefiles', FILE)
+    assert entry.complete and entry.md5 == md5 and entry.size == len(data)
+
+
+@responses.activate
+def test_sync_fetches_changed(data, md5):
+    ledger = SyncLedger(':memory:')
+    add_md5('0' * 32)
+    responses.add(responses.GET, FILE_URL, body=data)
+    chunks = list(PubMedSync(ledger=ledger).sync([FILE]))
+    assert isinstance(chunks[0].error, ValueError)
+    assert ledger.get('updatefiles', FILE) is None
+    responses.replace(responses.GET, f'{FILE_URL}.md5', body=f'MD5({FILE})= {md5}\n')
+    chunks = list(PubMedSync(ledger=ledger).sync([FILE]))
+    assert chunks[0].error is None
+    assert ledger.get('updatefiles', FILE).complete
+
+
+@responses.activate
+def test_sync_resumes_mid_file(data, md5):
+    add_md5(md5)
+    responses.add(responses.GET, FILE_URL, body=data)
+    ledger = SyncLedger(':memory:')
+    pubmed_sync = PubMedSync(ledger=ledger, download=PubMedDownload(retmax=1))
+    interrupted = pubmed_sync.sync([FILE])
+    delivered = [next(interrupted), next(interrupted)]
+    interrupted.close()
+    assert not ledger.get('updatefiles', FILE).complete
+    resumed = list(pubmed_sync.sync([FILE]))
+    assert resumed[0] == delivered[1]
+    assert len(delivered) - 1 + len(resumed) == 3
+    assert ledger.get('updatefiles', FILE).complete
+
+
+@responses.activate
+@pytest.mark.parametrize('headers, restarted', [({'ETag': '"abc"'}, False), ({'ETag': '"def"'}, True)])
+def test_sync_resume_checks_version(data, headers, restarted):
+    responses.add(responses.GET, f'{FILE_URL}.md5', status=404)
+    responses.add(responses.GET, FILE_URL, body=data, headers={'ETag': '"abc"'})
+    ledger = SyncLedger(':memory:')
+    pubmed_sync = PubMedSync(ledger=ledger, download=PubMedDownload(retmax=1))
+    interrupted = pubmed_sync.sync([FILE])
+    delivered = [next(interrupted), next(interrupted)]
+    interrupted.close()
+    responses.replace(responses.GET, FILE_URL, body=data, headers=headers)
+    resumed = list(pubmed_sync.sync([FILE]))
+    assert resumed[0] == delivered[0 if restarted else 1]
+    assert len(resumed) == (3 if restarted else 2)
+    assert ledger.get('updatefiles', FILE).etag == headers['ETag']
+
+
+@responses.activate
+def test_sync_conditional_request(data):
+    responses.add(responses.GET, f'{FILE_URL}.md5', status=404)
+    responses.add(responses.GET, FILE_URL, body=data, headers={'ETag': '"abc"'})
+    pubmed_sync = PubMedSync(ledger=SyncLedger(':memory:'))
+    assert len(list(pubmed_sync.sync([FILE]))) == 1
+    responses.replace(responses.GET, FILE_URL, status=304)
+    assert list(pubmed_sync.sync([FILE])) == []
+    assert file_calls()[-1].request.headers['If-None-Match'] == '"abc"'
+
+
+@responses.activate
+def test_sync_on_error(md5):
+    add_md5(md5)
+    responses.add(responses.GET, FILE_URL, status=404)
+    ledger = SyncLedger(':memory:')
+    chunks = list(PubMedSync(ledger=ledger).sync([FILE]))
+    assert chunks[0].error is not None
+    assert chunks[0].ids == [FILE]
+    assert ledger.entries('updatefiles') == []
+
+
+@responses.activate
+def test_sync_listed_files(mocker, shared_datadir, data, md5):
+    mocker.patch.dict(PubMedDownload._listings, clear=True)
+    listing = (shared_datadir / 'updatefiles.html').read_text()
+    responses.add(responses.GET, f'{PubMedDownload.base_url}updatefiles/', body=listing)
+    add_md5(md5)
+    responses.add(responses.GET, FILE_URL, body=data)
+    responses.add(responses.GET, re.compile(r'.*/pubmed2\dn1(116|313|167)\.xml\.gz(\.md5)?$'), status=404)
+    ledger = SyncLedger(':memory:')
+    chunks = list(PubMedSync(ledger=ledger).sync(download_path=DownloadPathEnum.updatefiles))
+    assert [chunk.ids[0] for chunk in chunks] == [
+        'pubmed22n1115.xml.gz',
+        'pubmed22n1116.xml.gz',
+        'pubmed22n1313.xml.gz',
+        'pubmed23n1167.xml.gz',
+    ]
+    assert chunks[0].error is None
+    assert all(chunk.error is not None for chunk in chunks[1:])